@@ -1,11 +1,18 @@
 from typing import Final
+import datetime
+import os
 import re
 
 WOLFRAM_API_URL: Final[str] = "http://api.wolframalpha.com/v1/result"
 READTHEDOCS_URL: Final[str] = "https://readthedocs.org/projects/search"
+READTHEDOCS_SEARCH_API_URL: Final[str] = "https://readthedocs.org/api/v3/search/"
 
 CATCH_COMMAND_ERRORS: Final[bool] = False
 DEFAULT_PREFIX: Final[str] = ">>"
+PREFIX_CACHE_SIZE: Final[int] = 10_000
+GUILD_CONFIG_CACHE_SIZE: Final[int] = 5_000
+GUILD_CONFIG_CACHE_TTL: Final[float] = 60 * 30
+USER_CONFIG_CACHE_SIZE: Final[int] = 50_000
 RESERVED_TAG_NAMES: Final[list[str]] = [
     "tag",
     "tags",
@@ -18,5 +25,66 @@ RESERVED_TAG_NAMES: Final[list[str]] = [
     "delete",
     "new",
     "remove",
+    "leaderboard",
 ]
 TAG_NAME_REGEX: Final[re.Pattern] = re.compile(r"^[A-z0-9_]{3,32}$")
+TAG_USES_FLUSH_INTERVAL: Final[float] = 30.0
+TAG_SEARCH_LIMIT: Final[int] = 50
+
+HTTP_MEMORY_CACHE_SIZE: Final[int] = 512
+HTTP_CACHE_TTL: Final[float] = 60 * 60
+HTTP_CACHE_STALE_RETENTION: Final[float] = 60 * 60 * 24  # how long stale responses are kept for conditional requests
+
+# per-endpoint freshness: how long a result is fresh, how long past that it may be served stale while it
+# is refreshed in the background, and how long a failed lookup is remembered
+STEAM_PROFILE_CACHE_TTL: Final[float] = 60 * 10
+STEAM_PROFILE_STALE_TTL: Final[float] = 60 * 60 * 24
+STEAM_PROFILE_NEGATIVE_TTL: Final[float] = 60 * 5
+STEAM_BATCH_SIZE: Final[int] = 100  # the most steamids GetPlayerSummaries takes at once
+STEAM_BATCH_DELAY: Final[float] = 0.005
+WOLFRAM_CACHE_TTL: Final[float] = 60 * 60 * 24
+WOLFRAM_STALE_TTL: Final[float] = 60 * 60 * 24 * 7
+WOLFRAM_NEGATIVE_TTL: Final[float] = 60 * 10
+RTFM_CACHE_TTL: Final[float] = 60 * 60 * 6
+RTFM_STALE_TTL: Final[float] = 60 * 60 * 24 * 7
+RTFM_NEGATIVE_TTL: Final[float] = 60 * 10
+RTFM_INDEX_CACHE_SIZE: Final[int] = 32  # projects (per version and language) whose symbol index is kept in memory
+RTFM_INDEX_REFRESH_INTERVAL: Final[float] = 60 * 60 * 12
+RTFM_RESULT_LIMIT: Final[int] = 50
+
+BROWSER_POOL_SIZE: Final[int] = max(1, min(4, (os.cpu_count() or 2) // 2))  # each worker is a whole Firefox process
+BROWSER_WORKER_MAX_PAGES: Final[int] = 100  # workers are recycled after this many renders, to shed leaked memory
+BROWSER_QUEUE_LIMIT: Final[int] = 16  # renders allowed to wait for a free worker before new ones are turned away
+BROWSER_CHECKOUT_TIMEOUT: Final[float] = 30.0
+BROWSER_HEALTH_CHECK_INTERVAL: Final[float] = 60.0  # idle workers older than this are checked before reuse
+BROWSER_READY_TIMEOUT: Final[float] = 10.0  # longest a render waits for its selector or for the network to go quiet
+BROWSER_NETWORK_IDLE_TIME: Final[float] = 0.5  # how long no resources have to finish loading for a page to count as idle
+BROWSER_READY_POLL_INTERVAL: Final[float] = 0.05
+
+SCREENSHOT_VIEWPORT: Final[tuple[int, int]] = (1280, 720)
+SCREENSHOT_CACHE_TTL: Final[float] = 60 * 10
+SCREENSHOT_MEMORY_CACHE_BYTES: Final[int] = 64 * 1024 * 1024
+SCREENSHOT_REDIS_MAX_BYTES: Final[int] = 2 * 1024 * 1024  # larger screenshots are only kept in memory
+
+SNIPE_CACHE_BYTES: Final[int] = 32 * 1024 * 1024  # estimated size of every channel's deleted/edited messages together
+SNIPE_STORE_ENABLED: Final[bool] = False  # also keep snipes in Redis streams, shared between processes and restarts
+SNIPE_STORE_MAXLEN: Final[int] = 1_000  # per channel
+SNIPE_STORE_RETENTION: Final[float] = 60 * 60 * 24 * 7
+SNIPE_STORE_FLUSH_INTERVAL: Final[float] = 1.0
+SNIPE_STORE_BATCH_SIZE: Final[int] = 500  # pending snipes which trigger a flush before the next interval
+
+# reward period -> (time between claims, coins per claim). each period needs a `next_<period>` column in user_data
+REWARDS: Final[dict[str, tuple[datetime.timedelta, int]]] = {
+    "hourly": (datetime.timedelta(hours=1), 100),
+    "daily": (datetime.timedelta(days=1), 200),
+    "weekly": (datetime.timedelta(weeks=1), 1000),
+    "monthly": (datetime.timedelta(days=30), 5000),
+}
+
+LEDGER_FLUSH_INTERVAL: Final[float] = 5.0
+LEDGER_BATCH_SIZE: Final[int] = 1_000  # pending entries which trigger a flush before the next interval
+LEDGER_MAX_PENDING: Final[int] = 100_000  # entries kept for retrying while the database is unavailable
+LEDGER_SNAPSHOT_INTERVAL: Final[float] = 60 * 60 * 24
+
+LEADERBOARD_REFRESH_INTERVAL: Final[float] = 60 * 5
+LEADERBOARD_PAGE_SIZE: Final[int] = 10
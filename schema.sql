@@ -70,4 +70,82 @@ CREATE TABLE IF NOT EXISTS tag_data (
     created_at TIMESTAMP NOT NULL DEFAULT NOW(),
     tag_uses INTEGER DEFAULT 0 CHECK (tag_uses >= 0),
     FOREIGN KEY (tag_id) REFERENCES tag_meta (tag_id) ON DELETE CASCADE
-)
\ No newline at end of file
+);
+
+-- trigram index for Tag.search, with guild_id in the same GIN index so searches stay within one guild
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+CREATE INDEX IF NOT EXISTS tag_meta_guild_name_trgm ON tag_meta USING GIN (guild_id, tag_name gin_trgm_ops);
+
+CREATE OR REPLACE FUNCTION notify_blacklist() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify('blacklist', 'TRUNCATE:');
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        PERFORM pg_notify('blacklist', 'DELETE:' || OLD.user_id);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM pg_notify('blacklist', 'INSERT:' || NEW.user_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS blacklist_notify ON blacklist;
+CREATE TRIGGER blacklist_notify
+    AFTER INSERT OR UPDATE OR DELETE ON blacklist
+    FOR EACH ROW EXECUTE FUNCTION notify_blacklist();
+
+DROP TRIGGER IF EXISTS blacklist_notify_truncate ON blacklist;
+CREATE TRIGGER blacklist_notify_truncate
+    AFTER TRUNCATE ON blacklist
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_blacklist();
+
+-- append-only record of every balance change, partitioned by month (see CoinLedger.ensure_partitions)
+CREATE TABLE IF NOT EXISTS coin_ledger (
+    entry_id BIGINT GENERATED ALWAYS AS IDENTITY,
+    user_id BIGINT NOT NULL,
+    delta BIGINT NOT NULL,
+    balance BIGINT,
+    reason VARCHAR(32) NOT NULL,
+    counterparty_id BIGINT DEFAULT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (created_at, entry_id)
+) PARTITION BY RANGE (created_at);
+CREATE TABLE IF NOT EXISTS coin_ledger_default PARTITION OF coin_ledger DEFAULT;
+CREATE INDEX IF NOT EXISTS coin_ledger_user_created ON coin_ledger (user_id, created_at);
+
+-- balances as of `taken_at`, so a balance at any time is the latest snapshot plus the ledger after it
+CREATE TABLE IF NOT EXISTS coin_balance_snapshots (
+    user_id BIGINT NOT NULL,
+    balance BIGINT NOT NULL,
+    taken_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (user_id, taken_at)
+);
+
+-- leaderboards, refreshed concurrently on a schedule (see UserDataManager/TagDataManager.refresh_leaderboard).
+-- the precomputed position makes a page an index range scan, and the unique id index (which REFRESH ... CONCURRENTLY
+-- requires) makes a rank lookup a single index probe
+CREATE MATERIALIZED VIEW IF NOT EXISTS coin_leaderboard AS
+    SELECT user_id, balance, ROW_NUMBER() OVER (ORDER BY balance DESC, user_id) AS position
+    FROM user_data
+    WHERE balance > 0;
+CREATE UNIQUE INDEX IF NOT EXISTS coin_leaderboard_user ON coin_leaderboard (user_id);
+CREATE UNIQUE INDEX IF NOT EXISTS coin_leaderboard_position ON coin_leaderboard (position);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS tag_leaderboard AS
+    SELECT
+        tag_meta.tag_id,
+        tag_meta.guild_id,
+        tag_meta.tag_name,
+        tag_meta.owner_id,
+        tag_data.tag_uses,
+        ROW_NUMBER() OVER (PARTITION BY tag_meta.guild_id ORDER BY tag_data.tag_uses DESC, tag_meta.tag_name) AS position
+    FROM tag_meta
+    JOIN tag_data ON tag_data.tag_id = tag_meta.tag_id
+    WHERE tag_data.tag_uses > 0;
+CREATE UNIQUE INDEX IF NOT EXISTS tag_leaderboard_tag ON tag_leaderboard (tag_id);
+CREATE UNIQUE INDEX IF NOT EXISTS tag_leaderboard_guild_position ON tag_leaderboard (guild_id, position);
+CREATE INDEX IF NOT EXISTS tag_leaderboard_guild_name ON tag_leaderboard (guild_id, tag_name);
@@ -0,0 +1,194 @@
+import asyncio
+from collections import OrderedDict
+import time
+from typing import Awaitable, Callable, Generic, Iterator, Mapping, Optional, TypeVar, overload
+
+_KT = TypeVar("_KT")
+_VT = TypeVar("_VT")
+_DT = TypeVar("_DT")
+
+
+class LRUCache(Generic[_KT, _VT]):
+    """
+    A bounded mapping which evicts the least recently used key, with an optional time-to-live per entry.
+    Given a `weigher`, `maxsize` bounds the total weight of the values (e.g. their size in bytes) instead of their count.
+    """
+
+    def __init__(self, maxsize: int, *, ttl: Optional[float] = None, weigher: Optional[Callable[[_VT], int]] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.weigher = weigher
+        self.weight = 0
+        self._data: OrderedDict[_KT, tuple[float | None, _VT]] = OrderedDict()
+
+    @overload
+    def get(self, key: _KT) -> _VT | None:
+        pass
+
+    @overload
+    def get(self, key: _KT, default: _DT) -> _VT | _DT:
+        pass
+
+    def get(self, key: _KT, default=None):
+        try:
+            expires_at, value = self._data[key]
+        except KeyError:
+            return default
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._remove(key)
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def peek(self, key: _KT, default: Optional[_VT] = None) -> _VT | None:
+        """Like `get`, but without marking the key as recently used"""
+        try:
+            expires_at, value = self._data[key]
+        except KeyError:
+            return default
+        if expires_at is not None and expires_at <= time.monotonic():
+            return default
+        return value
+
+    def set(self, key: _KT, value: _VT, *, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        if key in self._data:
+            self._remove(key)
+        if self.weigher is not None:
+            weight = self.weigher(value)
+            if weight > self.maxsize:
+                return  # would evict everything else and still not fit
+            self.weight += weight
+        self._data[key] = (expires_at, value)
+        while self._size() > self.maxsize:
+            self._remove(next(iter(self._data)))
+
+    def pop(self, key: _KT, default: Optional[_VT] = None) -> _VT | None:
+        try:
+            return self._remove(key)
+        except KeyError:
+            return default
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.weight = 0
+
+    def _size(self) -> int:
+        return len(self._data) if self.weigher is None else self.weight
+
+    def _remove(self, key: _KT) -> _VT:
+        value = self._data.pop(key)[1]
+        if self.weigher is not None:
+            self.weight -= self.weigher(value)
+        return value
+
+    def __getitem__(self, key: _KT) -> _VT:
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            raise KeyError(key)
+        return value  # type: ignore
+
+    def __setitem__(self, key: _KT, value: _VT) -> None:
+        self.set(key, value)
+
+    def __delitem__(self, key: _KT) -> None:
+        self._remove(key)
+
+    def __contains__(self, key: object) -> bool:
+        sentinel = object()
+        return self.get(key, sentinel) is not sentinel  # type: ignore
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __iter__(self) -> Iterator[_KT]:
+        return iter(list(self._data))
+
+
+class SingleFlight(Generic[_KT, _VT]):
+    """Shares one in-flight call between every concurrent caller asking for the same key"""
+
+    def __init__(self):
+        self._inflight: dict[_KT, asyncio.Future[_VT]] = {}
+
+    async def do(self, key: _KT, factory: Callable[[], Awaitable[_VT]]) -> _VT:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(factory())
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+        # shielded, so one caller being cancelled doesn't cancel the call for everyone else
+        return await asyncio.shield(future)
+
+    def _forget(self, key: _KT, done: asyncio.Future[_VT]) -> None:
+        if self._inflight.get(key) is done:
+            del self._inflight[key]
+        if not done.cancelled():
+            done.exception()  # mark as retrieved, in case every caller was cancelled
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._inflight
+
+
+class BatchLoader(Generic[_KT, _VT]):
+    """
+    Gathers keys requested within `delay` seconds of each other into a single call of `load_many`, which
+    takes at most `max_size` keys and returns what it found for them. Keys it doesn't return resolve to None.
+    """
+
+    def __init__(
+        self,
+        load_many: Callable[[list[_KT]], Awaitable[Mapping[_KT, _VT]]],
+        *,
+        max_size: int,
+        delay: float,
+    ):
+        self.load_many = load_many
+        self.max_size = max_size
+        self.delay = delay
+        self._pending: dict[_KT, asyncio.Future[Optional[_VT]]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running: set[asyncio.Future[None]] = set()
+
+    async def load(self, key: _KT) -> Optional[_VT]:
+        future = self._pending.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            future.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self._pending[key] = future
+            if len(self._pending) >= self.max_size:
+                self._dispatch()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.delay, self._dispatch)
+        # shielded, so one caller being cancelled doesn't fail the key for everyone else waiting on it
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            running = asyncio.ensure_future(self._run(batch))
+            self._running.add(running)  # keeps a reference until it's done
+            running.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: dict[_KT, asyncio.Future[Optional[_VT]]]) -> None:
+        try:
+            results = await self.load_many(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        except BaseException:
+            # cancelled (e.g. on shutdown), but callers are still waiting on the batch through their shields
+            for future in batch.values():
+                if not future.done():
+                    future.cancel()
+            raise
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(results.get(key))
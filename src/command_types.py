@@ -16,6 +16,13 @@ VocalGuildChannel = Union[VoiceChannel, StageChannel]
 GuildChannel = Union[VocalGuildChannel, ForumChannel, TextChannel, CategoryChannel]
 
 
+@dataclass(kw_only=True)
+class WebSearchResult:
+    title: str
+    url: str
+    description: str
+
+
 @dataclass(kw_only=True)
 class RTFMMeta:
     name: str
@@ -47,6 +54,15 @@ class GuildEntry:
     joined_at: datetime.datetime
 
 
+@dataclass(kw_only=True)
+class ClaimResult:
+    period: str
+    amount: int
+    claimed: bool
+    balance: int
+    next_claim: datetime.datetime  # when it can next be claimed, in UTC
+
+
 @dataclass(kw_only=True)
 class UserEntry:
     user_id: int
@@ -86,4 +102,19 @@ class SteamUser:
     custom_url: str
     time_created: datetime.datetime
     country_code: str
-    state_code: str
\ No newline at end of file
+    state_code: str
+
+@dataclass(kw_only=True)
+class CoinRanking:
+    user_id: int
+    balance: int
+    position: int
+
+
+@dataclass(kw_only=True)
+class TagRanking:
+    tag_id: int
+    tag_name: str
+    owner_id: int
+    uses: int
+    position: int
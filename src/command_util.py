@@ -88,12 +88,10 @@ class Paginator(SentinelView, Generic[NumT]):
         self.current_page = min(self.max_page, max(self.min_page, self.current_page))
 
         self.display_values_index_start = self.current_page * self.page_size
-        self.display_values_index_end = min(
-            len(self.values), (self.current_page + 1) * self.page_size
+        self.displayed_values = await self.get_page(self.current_page)
+        self.display_values_index_end = self.display_values_index_start + len(
+            self.displayed_values
         )
-        self.displayed_values = self.values[
-            self.display_values_index_start : self.display_values_index_end
-        ]
 
         if self.current_page == self.min_page:
             self.first_page.disabled = True
@@ -122,6 +120,12 @@ class Paginator(SentinelView, Generic[NumT]):
         if self.message is not None:
             await self.message.edit(embed=embed, view=self)
 
+    async def get_page(self, page: int) -> tuple[NumT]:
+        """Gets the values shown on a page. Override to load pages lazily instead of passing every value up front"""
+        return self.values[
+            page * self.page_size : min(len(self.values), (page + 1) * self.page_size)
+        ]
+
     async def embed(self, value_range: tuple[NumT]) -> discord.Embed:
         raise NotImplementedError
 
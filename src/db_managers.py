@@ -1,19 +1,197 @@
+import asyncio
 import datetime
 from enum import Enum
+import logging
 import time
-from typing import Optional, overload, Literal
+from typing import Iterable, Optional, overload, Literal
 import asyncpg
 
-from .command_types import TagEntry, MetaTagEntry, GuildEntry, GuildConfigEntry
+from . import error_types as SentinelErrors
+from .caches import LRUCache
+from .command_types import TagEntry, MetaTagEntry, GuildEntry, GuildConfigEntry, ClaimResult, CoinRanking, TagRanking
+from config import (
+    DEFAULT_PREFIX,
+    PREFIX_CACHE_SIZE,
+    GUILD_CONFIG_CACHE_SIZE,
+    GUILD_CONFIG_CACHE_TTL,
+    USER_CONFIG_CACHE_SIZE,
+    REWARDS,
+    LEDGER_BATCH_SIZE,
+    LEDGER_MAX_PENDING,
+)
 
 class SentinelDatabase:
     def __init__(self, apg: asyncpg.Pool):
         self.apg = apg
 
 
+class CoinLedger(SentinelDatabase):
+    """
+    Buffers balance changes and appends them to the `coin_ledger` table with COPY, off the write path.
+    Balances are snapshotted periodically, so reconstructing one only sums the ledger since the last snapshot
+    """
+
+    COLUMNS = ("user_id", "delta", "balance", "reason", "counterparty_id", "created_at")
+
+    def __init__(
+        self, apg: asyncpg.Pool, *, batch_size: int = LEDGER_BATCH_SIZE, max_pending: int = LEDGER_MAX_PENDING
+    ):
+        super().__init__(apg)
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.pending: list[tuple[int, int, Optional[int], str, Optional[int], datetime.datetime]] = []
+        self.flushing: Optional[asyncio.Future[None]] = None
+        self.failing = False  # while the database is refusing writes, only the periodic flush retries
+
+    def record(
+        self,
+        user_id: int,
+        delta: int,
+        balance: Optional[int],
+        reason: str,
+        counterparty_id: Optional[int] = None,
+        *,
+        created_at: datetime.datetime,
+    ) -> None:
+        """
+        Queues an entry. `balance` is the balance after the change, if it's known, and `created_at` must be the
+        database's NOW() for the write, so entries and snapshots are timestamped by the same clock
+        """
+        self.pending.append((user_id, delta, balance, reason, counterparty_id, created_at))
+        if len(self.pending) >= self.batch_size and self.flushing is None and not self.failing:
+            self.flushing = asyncio.ensure_future(self._flush_early())
+
+    async def _flush_early(self) -> None:
+        try:
+            await self.flush()
+        except Exception as e:
+            logging.warning(f"Failed to flush the coin ledger early, leaving it to the next interval: {e}")
+        finally:
+            self.flushing = None
+
+    async def flush(self) -> None:
+        """Writes every buffered entry with a single COPY"""
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, []
+        try:
+            await self.apg.copy_records_to_table("coin_ledger", records=pending, columns=self.COLUMNS)
+        except Exception:
+            # put them back, in order, so the next flush retries them, but don't grow without bound
+            self.failing = True
+            self.pending[:0] = pending
+            if len(self.pending) > self.max_pending:
+                dropped = len(self.pending) - self.max_pending
+                del self.pending[:dropped]
+                logging.error(f"Coin ledger backlog is full, dropped the {dropped} oldest entries")
+            raise
+        self.failing = False
+
+    async def ensure_partitions(self, months_ahead: int = 1) -> None:
+        """Creates the monthly partitions from this month to `months_ahead` months from now"""
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        start = today.replace(day=1)
+        for _ in range(months_ahead + 1):
+            end = (start + datetime.timedelta(days=32)).replace(day=1)
+            try:
+                await self.apg.execute(
+                    f"""
+                    CREATE TABLE IF NOT EXISTS coin_ledger_{start:%Y_%m} PARTITION OF coin_ledger
+                    FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')
+                    """
+                )
+            except asyncpg.PostgresError as e:
+                # e.g. rows for that month already landed in the default partition
+                logging.warning(f"Could not create ledger partition for {start:%Y-%m}: {e}")
+            start = end
+
+    async def snapshot(self) -> int:
+        """Snapshots the balance of every user with ledger entries since the last snapshot, returning how many"""
+        # taken_at is NOW(), the same clock as created_at, so balance_at splits entries at the right point
+        await self.flush()
+        result = await self.apg.execute(
+            """
+            INSERT INTO coin_balance_snapshots (user_id, balance, taken_at)
+            SELECT user_id, balance, NOW() FROM user_data
+            WHERE user_id IN (
+                SELECT DISTINCT user_id FROM coin_ledger
+                WHERE created_at >= COALESCE((SELECT MAX(taken_at) FROM coin_balance_snapshots), '-infinity')
+            )
+            ON CONFLICT (user_id, taken_at) DO NOTHING
+            """
+        )
+        return int(result.split()[-1])
+
+    async def seed_snapshots(self) -> int:
+        """
+        Snapshots every user who has never been snapshotted, so balances from before the ledger (or from users
+        who haven't transacted since) have a baseline to reconstruct from. Returns how many were seeded
+        """
+        await self.flush()
+        result = await self.apg.execute(
+            """
+            INSERT INTO coin_balance_snapshots (user_id, balance, taken_at)
+            SELECT user_id, balance, NOW() FROM user_data
+            WHERE NOT EXISTS (
+                SELECT 1 FROM coin_balance_snapshots WHERE coin_balance_snapshots.user_id = user_data.user_id
+            )
+            ON CONFLICT (user_id, taken_at) DO NOTHING
+            """
+        )
+        return int(result.split()[-1])
+
+    async def balance_at(self, user_id: int, at: datetime.datetime) -> Optional[int]:
+        """
+        Reconstructs a balance at a point in time from the latest snapshot before it and the ledger after that.
+        None if the user has no snapshot that early, since what they held before it is unknown
+        """
+        return await self.apg.fetchval(
+            """
+            WITH snapshot AS (
+                SELECT balance, taken_at FROM coin_balance_snapshots
+                WHERE user_id = $1 AND taken_at <= $2
+                ORDER BY taken_at DESC
+                LIMIT 1
+            )
+            SELECT (SELECT balance FROM snapshot) + COALESCE(SUM(delta), 0)
+            FROM coin_ledger
+            WHERE user_id = $1
+                AND created_at > (SELECT taken_at FROM snapshot)
+                AND created_at <= $2
+            """,
+            user_id,
+            at,
+        )
+
+    async def net_flow(self, user_id: int, since: datetime.datetime) -> int:
+        """The sum of a user's balance changes since `since`, which only scans the partitions after it"""
+        return await self.apg.fetchval(
+            "SELECT COALESCE(SUM(delta), 0) FROM coin_ledger WHERE user_id = $1 AND created_at >= $2",
+            user_id,
+            since,
+        )
+
+
 class UserDataManager(SentinelDatabase):
     """Should be used for getting and setting user data (currently only balance)"""
 
+    def __init__(self, apg: asyncpg.Pool, ledger: Optional[CoinLedger] = None):
+        super().__init__(apg)
+        self.ledger = ledger
+
+    def _record(
+        self,
+        user_id: int,
+        delta: int,
+        balance: Optional[int],
+        reason: str,
+        counterparty_id: Optional[int] = None,
+        *,
+        created_at: datetime.datetime,
+    ) -> None:
+        if self.ledger is not None and delta:
+            self.ledger.record(user_id, delta, balance, reason, counterparty_id, created_at=created_at)
+
     async def ensure_user(self, user_id: int) -> None:
         await self.apg.execute(
             "INSERT INTO user_data (user_id, balance) VALUES ($1, $2) ON CONFLICT (user_id) DO NOTHING",
@@ -51,76 +229,141 @@ class UserDataManager(SentinelDatabase):
     async def set_balance(
         self, user_id: int, balance: int, create_if_unfound: bool = True
     ) -> None:
-        if create_if_unfound:
-            await self.apg.execute(
-                "INSERT INTO user_data (user_id, balance) VALUES ($1, $2) ON CONFLICT (user_id) DO UPDATE SET balance = $2",
-                user_id,
-                balance,
-            )
-        else:
-            await self.apg.execute(
-                "UPDATE user_data SET balance = $2 WHERE user_id = $1", user_id, balance
-            )
+        # the old balance is locked and read before the write, in one transaction, so the ledger gets the delta
+        async with self.apg.acquire() as connection:
+            async with connection.transaction():
+                if create_if_unfound:
+                    await connection.execute(
+                        "INSERT INTO user_data (user_id, balance) VALUES ($1, 0) ON CONFLICT (user_id) DO NOTHING",
+                        user_id,
+                    )
+                previous = await connection.fetchrow(
+                    "SELECT balance, NOW() AS changed_at FROM user_data WHERE user_id = $1 FOR UPDATE", user_id
+                )
+                if previous is None:
+                    return
+                await connection.execute(
+                    "UPDATE user_data SET balance = $2 WHERE user_id = $1", user_id, balance
+                )
+        self._record(user_id, balance - previous["balance"], balance, "set", created_at=previous["changed_at"])
 
     async def modify_balance(
-        self, user_id: int, amount: int, create_if_unfound: bool = True
+        self, user_id: int, amount: int, create_if_unfound: bool = True, reason: str = "modify"
     ) -> None:
         if create_if_unfound:
-            await self.apg.execute(
-                "INSERT INTO user_data (user_id, balance) VALUES ($1, $2) ON CONFLICT (user_id) DO UPDATE SET balance = user_data.balance + $2",
+            result = await self.apg.fetchrow(
+                "INSERT INTO user_data (user_id, balance) VALUES ($1, $2) ON CONFLICT (user_id) DO UPDATE SET balance = user_data.balance + $2 RETURNING balance, NOW() AS changed_at",
                 user_id,
                 amount,
             )
         else:
-            await self.apg.execute(
-                "UPDATE user_data SET balance = user_data.balance + $2 WHERE user_id = $1",
+            result = await self.apg.fetchrow(
+                "UPDATE user_data SET balance = user_data.balance + $2 WHERE user_id = $1 RETURNING balance, NOW() AS changed_at",
                 user_id,
                 amount,
             )
+        if result is not None:
+            self._record(user_id, amount, result["balance"], reason, created_at=result["changed_at"])
+
+    # locks both rows in user_id order (so opposing transfers can't deadlock), then moves the coins only if
+    # both users exist and the giver can afford it. the scalar subqueries on `locked` are init plans, so every
+    # lock is taken before any row is updated
+    TRANSFER_BALANCE = """
+        WITH locked AS (
+            SELECT user_id, balance FROM user_data
+            WHERE user_id IN ($1, $2)
+            ORDER BY user_id
+            FOR UPDATE
+        ),
+        moved AS (
+            UPDATE user_data
+            SET balance = user_data.balance + CASE WHEN user_data.user_id = $1 THEN -$3::bigint ELSE $3::bigint END
+            WHERE user_data.user_id IN ($1, $2)
+                AND (SELECT count(*) FROM locked) = 2
+                AND (SELECT balance FROM locked WHERE user_id = $1) >= $3::bigint
+            RETURNING user_data.user_id, user_data.balance
+        )
+        SELECT
+            (SELECT count(*) FROM locked) AS found,
+            (SELECT balance FROM moved WHERE user_id = $1) AS giver_balance,
+            (SELECT balance FROM moved WHERE user_id = $2) AS receiver_balance,
+            (SELECT balance FROM locked WHERE user_id = $1) AS giver_previous,
+            (SELECT balance FROM locked WHERE user_id = $2) AS receiver_previous,
+            NOW() AS moved_at
+    """
+
+    async def get_balances(self, *user_ids: int) -> dict[int, int]:
+        """Balances for several users in one query, creating any that don't exist yet"""
+        rows = await self.apg.fetch(
+            """
+            WITH inserted AS (
+                INSERT INTO user_data (user_id, balance) SELECT unnest($1::bigint[]), 0
+                ON CONFLICT (user_id) DO NOTHING
+                RETURNING user_id, balance
+            )
+            SELECT user_id, balance FROM user_data WHERE user_id = ANY($1::bigint[])
+            UNION ALL
+            SELECT user_id, balance FROM inserted
+            """,
+            list(set(user_ids)),
+        )
+        return {row["user_id"]: row["balance"] for row in rows}
 
-    @overload
     async def give_balance(
         self,
         giver_id: int,
         receiver_id: int,
         amount: int,
-        create_if_unfound: bool = True,
     ) -> tuple[bool, int, int]:
-        pass
+        """
+        Atomically moves `amount` from the giver to the receiver, creating either if needed.
+        Returns whether it happened, and both balances afterwards (unchanged if it didn't)
+        """
+        if amount < 1:
+            raise SentinelErrors.InvalidAmount("Amount must be positive")
+        if giver_id == receiver_id:
+            raise SentinelErrors.InvalidAmount("Cannot give coins to yourself")
+
+        result = await self.apg.fetchrow(self.TRANSFER_BALANCE, giver_id, receiver_id, amount)
+        if result["found"] < 2:  # only the first transfer between new users pays for this
+            await self.apg.execute(
+                "INSERT INTO user_data (user_id, balance) VALUES ($1, 0), ($2, 0) ON CONFLICT (user_id) DO NOTHING",
+                giver_id,
+                receiver_id,
+            )
+            result = await self.apg.fetchrow(self.TRANSFER_BALANCE, giver_id, receiver_id, amount)
 
-    @overload
-    async def give_balance(
-        self,
-        giver_id: int,
-        receiver_id: int,
-        amount: int,
-        create_if_unfound: bool = False,
-    ) -> tuple[bool, int | None, int | None]:
-        pass
+        if result["giver_balance"] is None:
+            return False, result["giver_previous"], result["receiver_previous"]
+        moved_at = result["moved_at"]
+        self._record(giver_id, -amount, result["giver_balance"], "transfer", receiver_id, created_at=moved_at)
+        self._record(receiver_id, amount, result["receiver_balance"], "transfer", giver_id, created_at=moved_at)
+        return True, result["giver_balance"], result["receiver_balance"]
 
-    async def give_balance(
-        self,
-        giver_id: int,
-        receiver_id: int,
-        amount: int,
-    ) -> tuple[bool, int | None, int | None]:
-        giver_bal = await self.get_balance(giver_id, create_if_unfound=True)
-        rec_bal = await self.get_balance(receiver_id, create_if_unfound=True)
+    async def refresh_leaderboard(self) -> None:
+        """Recomputes `coin_leaderboard` without blocking readers of the old one"""
+        await self.apg.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY coin_leaderboard")
 
-        # here, we assume that the balances have already
-        # been checked for validity (ie, this person has enough to give 5 away)
+    async def get_leaderboard_size(self) -> int:
+        # positions are contiguous, so the last one is the count, read off the end of the position index
+        return await self.apg.fetchval("SELECT COALESCE(MAX(position), 0) FROM coin_leaderboard")
 
-        await self.apg.execute(
-            "UPDATE user_data SET balance = user_data.balance - $2 WHERE user_id = $1",
-            giver_id,
-            amount,
+    async def get_leaderboard_page(self, offset: int, limit: int) -> list[CoinRanking]:
+        rows = await self.apg.fetch(
+            "SELECT user_id, balance, position FROM coin_leaderboard WHERE position > $1 ORDER BY position LIMIT $2",
+            offset,
+            limit,
         )
-        await self.apg.execute(
-            "UPDATE user_data SET balance = user_data.balance + $2 WHERE user_id = $1",
-            receiver_id,
-            amount,
+        return [CoinRanking(user_id=row["user_id"], balance=row["balance"], position=row["position"]) for row in rows]
+
+    async def get_leaderboard_rank(self, user_id: int) -> CoinRanking | None:
+        """A user's place as of the last refresh, or None if they weren't on it"""
+        row = await self.apg.fetchrow(
+            "SELECT user_id, balance, position FROM coin_leaderboard WHERE user_id = $1", user_id
         )
-        return True, giver_bal - amount, rec_bal + amount
+        if row is None:
+            return None
+        return CoinRanking(user_id=row["user_id"], balance=row["balance"], position=row["position"])
 
     async def add_tokens(self, user_id: int, amount: int) -> int:
         tokens: int = int(await self.apg.execute(
@@ -146,133 +389,75 @@ class UserDataManager(SentinelDatabase):
         )
         return amount
     
-    async def try_hourly(self, user_id: int, success_amount: int) -> bool:
-        await self.ensure_user(user_id)
-        result = await self.apg.fetchval(
-            """
-            SELECT next_hourly FROM user_data WHERE user_id = $1
-            """,
-            user_id,
-        )
-        if result is not None and datetime.datetime.utcnow() > result:
-            await self.apg.execute(
-                """
-                UPDATE user_data SET next_hourly = $2, balance = balance + $3 WHERE user_id = $1
-                """,
-                user_id,
-                datetime.datetime.utcnow() + datetime.timedelta(hours=1),
-                success_amount,
-            )
-            return True
-        return False
-    
-    async def get_next_hourly(self, user_id: int) -> datetime.datetime:
-        await self.ensure_user(user_id)
-        return await self.apg.fetchval(
-            """
-            SELECT next_hourly FROM user_data WHERE user_id = $1
-            """,
-            user_id,
-        ) # type: ignore
-    
-    async def try_daily(self, user_id: int, success_amount: int) -> bool:
-        await self.ensure_user(user_id)
-        result = await self.apg.fetchval(
-            """
-            SELECT next_daily FROM user_data WHERE user_id = $1
-            """,
-            user_id,
-        )
-        if result is not None and datetime.datetime.utcnow() > result:
-            await self.apg.execute(
-                """
-                UPDATE user_data SET next_daily = $2, balance = balance + $3 WHERE user_id = $1
-                """,
-                user_id,
-                datetime.datetime.utcnow() + datetime.timedelta(days=1),
-                success_amount,
-            )
-            return True
-        return False
-    
-    async def get_next_daily(self, user_id: int) -> datetime.datetime:
-        await self.ensure_user(user_id)
-        return await self.apg.fetchval(
-            """
-            SELECT next_daily FROM user_data WHERE user_id = $1
-            """,
-            user_id,
-        ) # type: ignore
-    
-    async def try_weekly(self, user_id: int, success_amount: int) -> bool:
-        await self.ensure_user(user_id)
-        result = await self.apg.fetchval(
-            """
-            SELECT next_weekly FROM user_data WHERE user_id = $1
-            """,
-            user_id,
-        )
-        if result is not None and datetime.datetime.utcnow() > result:
-            await self.apg.execute(
-                """
-                UPDATE user_data SET next_weekly = $2, balance = balance + $3 WHERE user_id = $1
-                """,
-                user_id,
-                datetime.datetime.utcnow() + datetime.timedelta(days=7),
-                success_amount,
+    async def claim_rewards(self, user_id: int, periods: Iterable[str]) -> list[ClaimResult]:
+        """
+        Claims every given reward period (see `config.REWARDS`) that is due, in a single UPDATE.
+        Periods which aren't due yet are reported with when they will be
+        """
+        periods = list(dict.fromkeys(periods))
+        if not periods:
+            return []
+        query, params = self._claim_query(periods)
+        row = await self.apg.fetchrow(query, user_id, *params)
+        if row is None:
+            await self.ensure_user(user_id)
+            row = await self.apg.fetchrow(query, user_id, *params)
+
+        # one ledger entry per claimed period, with the balance running up to the final one
+        claimed = [period for period in periods if row[f"{period}_claimed"]]
+        balance = row["balance"] - sum(REWARDS[period][1] for period in claimed)
+        for period in claimed:
+            balance += REWARDS[period][1]
+            self._record(user_id, REWARDS[period][1], balance, period, created_at=row["claimed_at"])
+
+        return [
+            ClaimResult(
+                period=period,
+                amount=REWARDS[period][1],
+                claimed=row[f"{period}_claimed"],
+                balance=row["balance"],
+                next_claim=row[f"next_{period}"].replace(tzinfo=datetime.timezone.utc),
             )
-            return True
-        return False
-    
-    async def get_next_weekly(self, user_id: int) -> datetime.datetime:
-        await self.ensure_user(user_id)
-        return await self.apg.fetchval(
-            """
-            SELECT next_weekly FROM user_data WHERE user_id = $1
-            """,
-            user_id,
-        ) # type: ignore
-
-    async def try_monthly(self, user_id: int, success_amount: int) -> bool:
-        await self.ensure_user(user_id)
-        result = await self.apg.fetchval(
-            """
-            SELECT next_monthly FROM user_data WHERE user_id = $1
-            """,
-            user_id,
-        )
-        if result is not None and datetime.datetime.utcnow() > result:
-            await self.apg.execute(
-                """
-                UPDATE user_data SET next_monthly = $2, balance = balance + $3 WHERE user_id = $1
-                """,
-                user_id,
-                datetime.datetime.utcnow() + datetime.timedelta(days=30),
-                success_amount,
-            )
-            return True
-        return False
-    
-    async def get_next_monthly(self, user_id: int) -> datetime.datetime:
-        await self.ensure_user(user_id)
-        return await self.apg.fetchval(
-            """
-            SELECT next_monthly FROM user_data WHERE user_id = $1
-            """,
-            user_id,
-        ) # type: ignore
-    
-
-
-
-
+            for period in periods
+        ]
+
+    async def claim_reward(self, user_id: int, period: str) -> ClaimResult:
+        return (await self.claim_rewards(user_id, [period]))[0]
+
+    @staticmethod
+    def _claim_query(periods: list[str]) -> tuple[str, list[datetime.timedelta | int]]:
+        # SET expressions all see the row as it was, so each period is checked against its old next_* time.
+        # NOW() is fixed for the statement, so a period was claimed exactly when its new time is NOW() + interval.
+        # the row lock makes a concurrent claim wait, then re-evaluate against this claim's result
+        now = "(NOW() AT TIME ZONE 'UTC')"
+        sets: list[str] = []
+        gains: list[str] = []
+        returns: list[str] = []
+        params: list[datetime.timedelta | int] = []
+        for period in periods:
+            if period not in REWARDS:
+                raise ValueError(f"Unknown reward period: {period!r}")
+            interval, amount = REWARDS[period]
+            column = f"next_{period}"
+            params += [interval, amount]
+            interval_param, amount_param = f"${len(params)}::interval", f"${len(params) + 1}::bigint"
+            due = f"COALESCE({column}, '-infinity') <= {now}"
+            sets.append(f"{column} = CASE WHEN {due} THEN {now} + {interval_param} ELSE {column} END")
+            gains.append(f"CASE WHEN {due} THEN {amount_param} ELSE 0 END")
+            returns.append(f"{column}, {column} = {now} + {interval_param} AS {period}_claimed")
+        query = (
+            f"UPDATE user_data SET {', '.join(sets)}, balance = balance + {' + '.join(gains)} "
+            f"WHERE user_id = $1 RETURNING balance, NOW() AS claimed_at, {', '.join(returns)}"
+        )
+        return query, params
 
 
 class TagDataManager(SentinelDatabase):
-    def __init__(self, apg: asyncpg.Pool):
+    def __init__(self, apg: asyncpg.Pool, ledger: Optional[CoinLedger] = None):
         super().__init__(apg)
         self.gdm = GuildDataManager(apg)
-        self.usm = UserDataManager(apg)
+        self.usm = UserDataManager(apg, ledger)
+        self.pending_uses: dict[int, int] = {}  # tag_id -> uses not yet written, see flush_tag_uses
 
     @overload
     async def get_tag_by_name(
@@ -289,50 +474,50 @@ class TagDataManager(SentinelDatabase):
     async def get_tag_by_name(
         self, guild_id: int, tag_name: str, *, allow_redirect: bool
     ) -> TagEntry | MetaTagEntry | None:
-        meta_result = await self.apg.fetchrow(
-            "SELECT * FROM tag_meta WHERE guild_id = $1 AND tag_name = $2",
-            guild_id,
-            tag_name,
-        )
-        updated_meta_result: asyncpg.Record | None = None
-        if meta_result is None:
+        result = await self.apg.fetchrow(self.RESOLVE_TAG_BY_NAME, guild_id, tag_name)
+        if result is None:
             return None
-        redirected: bool
-        resolved_id: int
-        if meta_result["alias_to"] is not None:
-            if allow_redirect:
-                updated_meta_result = await self.apg.fetchrow(
-                    "SELECT * FROM tag_meta WHERE tag_id = $1",
-                    meta_result["alias_to"],
-                )
-                resolved_id = meta_result["alias_to"]
-                redirected = True
-            else:
-                return self._form_meta_tag(meta_result)
+        if result["requested_alias_to"] is None:
+            redirected_from = None
+        elif allow_redirect:
+            # if we were redirected, give the original name that was queried
+            redirected_from = self._form_meta_tag(result, prefix="requested_")
         else:
-            resolved_id = meta_result["tag_id"]
-            redirected = False
-
-        full_result = await self.apg.fetchrow(
-            "SELECT * FROM tag_data WHERE tag_id = $1", resolved_id
-        )
-        return self._form_tag(
-            updated_meta_result if redirected else meta_result,
-            full_result,
-            self._form_meta_tag(meta_result) if redirected else None,
-        )
-        # if we were redirected, give the origianl name that was queried
+            return self._form_meta_tag(result, prefix="requested_")
+        if result["tag_id"] is None or result["tag_content"] is None:
+            return None  # alias to a deleted tag, or a tag without data
+        return self._form_tag(result, result, redirected_from)
+
+    # kept as one constant so asyncpg's per-connection statement cache prepares it once
+    RESOLVE_TAG_BY_NAME = """
+        SELECT
+            requested.tag_id AS requested_tag_id,
+            requested.tag_name AS requested_tag_name,
+            requested.owner_id AS requested_owner_id,
+            requested.guild_id AS requested_guild_id,
+            requested.alias_to AS requested_alias_to,
+            target.tag_id, target.tag_name, target.owner_id, target.guild_id, target.alias_to,
+            tag_data.tag_content, tag_data.created_at, tag_data.tag_uses
+        FROM tag_meta AS requested
+        LEFT JOIN tag_meta AS target ON target.tag_id = COALESCE(requested.alias_to, requested.tag_id)
+        LEFT JOIN tag_data ON tag_data.tag_id = target.tag_id
+        WHERE requested.guild_id = $1 AND requested.tag_name = $2
+    """
 
     async def get_tag_by_id(self, tag_id: int) -> TagEntry | None:
-        meta_result = await self.apg.fetchrow(
-            "SELECT * FROM tag_meta WHERE tag_id = $1", tag_id
+        result = await self.apg.fetchrow(
+            self.SELECT_TAGS + " WHERE tag_meta.tag_id = $1", tag_id
         )
-        if meta_result is None:
+        if result is None:
             return None
-        full_result = await self.apg.fetchrow(
-            "SELECT * FROM tag_data WHERE tag_id = $1", tag_id
-        )
-        return self._form_tag(meta_result, full_result)
+        return self._form_tag(result, result)
+
+    SELECT_TAGS = """
+        SELECT
+            tag_meta.tag_id, tag_meta.tag_name, tag_meta.owner_id, tag_meta.guild_id, tag_meta.alias_to,
+            tag_data.tag_content, tag_data.created_at, tag_data.tag_uses
+        FROM tag_meta INNER JOIN tag_data ON tag_data.tag_id = tag_meta.tag_id
+    """  # aliases have no tag_data row, so the inner join leaves them out
 
     async def get_tags_by_owner(self, owner_id: int) -> list[TagEntry]:
         tag_data = await self.apg.fetch(
@@ -347,14 +532,76 @@ class TagDataManager(SentinelDatabase):
         return tags
 
     async def get_tags_in_guild(self, guild_id: int) -> list[TagEntry]:
-        tag_data = await self.apg.fetch(
-            "SELECT tag_id, alias_to FROM tag_meta WHERE guild_id = $1", guild_id
+        results = await self.apg.fetch(
+            self.SELECT_TAGS + " WHERE tag_meta.guild_id = $1 ORDER BY tag_meta.tag_name",
+            guild_id,
         )
-        tags = []
-        for tag_node in tag_data:
-            if tag_node["alias_to"] is not None:
-                continue
-            tags.append(await self.get_tag_by_id(tag_node["tag_id"]))
+        return [self._form_tag(result, result) for result in results]
+
+    async def search_tags(
+        self, guild_id: int, query: str, *, threshold: float, limit: int
+    ) -> list[tuple[TagEntry, float]]:
+        """Ranks a guild's tags by trigram similarity of their name to the query, using the pg_trgm index"""
+        async with self.apg.acquire() as connection:
+            async with connection.transaction():
+                # `%` only uses the index with the session threshold, so scope it to this transaction
+                await connection.execute(
+                    "SELECT set_config('pg_trgm.similarity_threshold', $1, true)",
+                    str(threshold),
+                )
+                results = await connection.fetch(
+                    """
+                    SELECT
+                        tag_meta.tag_id, tag_meta.tag_name, tag_meta.owner_id, tag_meta.guild_id, tag_meta.alias_to,
+                        tag_data.tag_content, tag_data.created_at, tag_data.tag_uses,
+                        similarity(tag_meta.tag_name, $2) AS score
+                    FROM tag_meta INNER JOIN tag_data ON tag_data.tag_id = tag_meta.tag_id
+                    WHERE tag_meta.guild_id = $1 AND tag_meta.tag_name % $2
+                    ORDER BY score DESC, tag_meta.tag_name
+                    LIMIT $3
+                    """,
+                    guild_id,
+                    query,
+                    limit,
+                )
+        return [(self._form_tag(result, result), result["score"]) for result in results]
+
+    async def count_tags_in_guild(self, guild_id: int) -> int:
+        return await self.apg.fetchval(
+            "SELECT COUNT(*) FROM tag_meta INNER JOIN tag_data ON tag_data.tag_id = tag_meta.tag_id WHERE tag_meta.guild_id = $1",
+            guild_id,
+        )
+
+    async def get_tags_in_guild_page(
+        self,
+        guild_id: int,
+        limit: int,
+        *,
+        after: str | None = None,
+        before: str | None = None,
+        from_end: bool = False,
+        offset: int = 0,
+    ) -> list[TagEntry]:
+        """
+        Gets one page of a guild's tags, ordered by name, using the (guild_id, tag_name) index as a keyset.
+        `after`/`before` are the names bordering the page, and `from_end` gets the last `limit` tags.
+        Without either, `offset` is a plain (slower) OFFSET for pages whose neighbours are unknown.
+        """
+        if after is not None:
+            query = self.SELECT_TAGS + " WHERE tag_meta.guild_id = $1 AND tag_meta.tag_name > $3 ORDER BY tag_meta.tag_name LIMIT $2"
+            args = (guild_id, limit, after)
+        elif before is not None:
+            query = self.SELECT_TAGS + " WHERE tag_meta.guild_id = $1 AND tag_meta.tag_name < $3 ORDER BY tag_meta.tag_name DESC LIMIT $2"
+            args = (guild_id, limit, before)
+        elif from_end:
+            query = self.SELECT_TAGS + " WHERE tag_meta.guild_id = $1 ORDER BY tag_meta.tag_name DESC LIMIT $2"
+            args = (guild_id, limit)
+        else:
+            query = self.SELECT_TAGS + " WHERE tag_meta.guild_id = $1 ORDER BY tag_meta.tag_name LIMIT $2 OFFSET $3"
+            args = (guild_id, limit, offset)
+        tags = [self._form_tag(result, result) for result in await self.apg.fetch(query, *args)]
+        if before is not None or (from_end and after is None):
+            tags.reverse()
         return tags
 
     async def create_tag(
@@ -474,10 +721,72 @@ class TagDataManager(SentinelDatabase):
         return ReturnCode.SUCCESS
 
     async def increment_tag_uses(self, tag_id: int, amount: int = 1) -> None:
-        await self.apg.execute(
-            "UPDATE tag_data SET tag_uses = tag_uses + $2 WHERE tag_id = $1",
-            tag_id,
-            amount,
+        self.pending_uses[tag_id] = self.pending_uses.get(tag_id, 0) + amount
+
+    async def flush_tag_uses(self) -> None:
+        """Writes every buffered use count in a single statement"""
+        if not self.pending_uses:
+            return
+        pending, self.pending_uses = self.pending_uses, {}
+        try:
+            await self.apg.execute(
+                """
+                UPDATE tag_data SET tag_uses = tag_data.tag_uses + increments.amount
+                FROM unnest($1::bigint[], $2::int[]) AS increments(tag_id, amount)
+                WHERE tag_data.tag_id = increments.tag_id
+                """,
+                list(pending.keys()),
+                list(pending.values()),
+            )
+        except Exception:
+            # put the counts back so the next flush retries them
+            for tag_id, amount in pending.items():
+                self.pending_uses[tag_id] = self.pending_uses.get(tag_id, 0) + amount
+            raise
+
+    async def refresh_leaderboard(self) -> None:
+        """Writes buffered uses, then recomputes `tag_leaderboard` without blocking readers of the old one"""
+        await self.flush_tag_uses()
+        await self.apg.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY tag_leaderboard")
+
+    async def get_leaderboard_size(self, guild_id: int) -> int:
+        return await self.apg.fetchval(
+            "SELECT COALESCE(MAX(position), 0) FROM tag_leaderboard WHERE guild_id = $1", guild_id
+        )
+
+    async def get_leaderboard_page(self, guild_id: int, offset: int, limit: int) -> list[TagRanking]:
+        rows = await self.apg.fetch(
+            """
+            SELECT tag_id, tag_name, owner_id, tag_uses, position FROM tag_leaderboard
+            WHERE guild_id = $1 AND position > $2
+            ORDER BY position
+            LIMIT $3
+            """,
+            guild_id,
+            offset,
+            limit,
+        )
+        return [self._form_tag_ranking(row) for row in rows]
+
+    async def get_leaderboard_rank(self, guild_id: int, tag_name: str) -> TagRanking | None:
+        """A tag's place in its guild as of the last refresh, or None if it wasn't on it"""
+        row = await self.apg.fetchrow(
+            """
+            SELECT tag_id, tag_name, owner_id, tag_uses, position FROM tag_leaderboard
+            WHERE guild_id = $1 AND tag_name = $2
+            """,
+            guild_id,
+            tag_name,
+        )
+        return None if row is None else self._form_tag_ranking(row)
+
+    def _form_tag_ranking(self, result) -> TagRanking:
+        return TagRanking(
+            tag_id=result["tag_id"],
+            tag_name=result["tag_name"],
+            owner_id=result["owner_id"],
+            uses=result["tag_uses"],
+            position=result["position"],
         )
 
     async def transfer_tag_ownership(
@@ -504,7 +813,7 @@ class TagDataManager(SentinelDatabase):
         return TagEntry(
             tag_id=full_result["tag_id"],
             tag_name=meta_result["tag_name"],
-            uses=full_result["tag_uses"],
+            uses=full_result["tag_uses"] + self.pending_uses.get(full_result["tag_id"], 0),
             owner_id=meta_result["owner_id"],
             guild_id=meta_result["guild_id"],
             tag_content=full_result["tag_content"],
@@ -512,13 +821,13 @@ class TagDataManager(SentinelDatabase):
             redirected_from=redirected_from,
         )
 
-    def _form_meta_tag(self, result) -> MetaTagEntry:
+    def _form_meta_tag(self, result, prefix: str = "") -> MetaTagEntry:
         return MetaTagEntry(
-            tag_id=result["tag_id"],
-            tag_name=result["tag_name"],
-            owner_id=result["owner_id"],
-            guild_id=result["guild_id"],
-            alias_to=result["alias_to"],
+            tag_id=result[prefix + "tag_id"],
+            tag_name=result[prefix + "tag_name"],
+            owner_id=result[prefix + "owner_id"],
+            guild_id=result[prefix + "guild_id"],
+            alias_to=result[prefix + "alias_to"],
         )
 
 
@@ -602,6 +911,15 @@ class GuildDataManager(SentinelDatabase):
 
 
 class GuildConfigManager(SentinelDatabase):
+    def __init__(self, apg: asyncpg.Pool):
+        super().__init__(apg)
+        self.prefixes: LRUCache[int, str] = LRUCache(PREFIX_CACHE_SIZE)
+        self.configs: LRUCache[int, GuildConfigEntry] = LRUCache(
+            GUILD_CONFIG_CACHE_SIZE, ttl=GUILD_CONFIG_CACHE_TTL
+        )
+        # bumped by every write, so a read or write which raced a newer write doesn't cache its older row
+        self.generations: dict[int, int] = {}
+
     def _form_guild_config(self, result) -> GuildConfigEntry:
         return GuildConfigEntry(
             guild_id=result["guild_id"],
@@ -622,14 +940,44 @@ class GuildConfigManager(SentinelDatabase):
         )
 
     async def get_guild_config(self, guild_id: int) -> GuildConfigEntry | None:
+        cached = self.configs.get(guild_id)
+        if cached is not None:
+            return cached
+        generation = self.generations.get(guild_id, 0)
         result = await self.apg.fetchrow(
             "SELECT * FROM guild_configs WHERE guild_id = $1", guild_id
         )
         if result is None:
             return None
-        return self._form_guild_config(result)
+        config = self._form_guild_config(result)
+        self._cache_config(guild_id, config, generation)
+        return config
+
+    def _cache_config(self, guild_id: int, config: GuildConfigEntry, generation: int) -> None:
+        if self.generations.get(guild_id, 0) == generation:
+            self.configs[guild_id] = config
+        else:
+            self.configs.pop(guild_id)  # a write landed meanwhile, so the next read fetches the current row
+
+    async def _set(self, guild_id: int, column: str, value: object) -> bool:
+        """Updates one column, writing the updated row through to the cache"""
+        generation = self.generations[guild_id] = self.generations.get(guild_id, 0) + 1
+        result = await self.apg.fetchrow(
+            f"UPDATE guild_configs SET {column} = $2 WHERE guild_id = $1 RETURNING *",
+            guild_id,
+            value,
+        )
+        if result is None:
+            self.configs.pop(guild_id)
+            return False
+        self._cache_config(guild_id, self._form_guild_config(result), generation)
+        return True
     
     async def ensure_guild_config(self, guild_id: int) -> GuildConfigEntry:
+        cached = self.configs.get(guild_id)
+        if cached is not None:
+            return cached
+        generation = self.generations.get(guild_id, 0)
         result = await self.apg.fetchrow(
             "INSERT INTO guild_configs(guild_id) VALUES ($1) ON CONFLICT DO NOTHING RETURNING *",
             guild_id,
@@ -638,208 +986,130 @@ class GuildConfigManager(SentinelDatabase):
             result = await self.apg.fetchrow(
                 "SELECT * FROM guild_configs WHERE guild_id = $1", guild_id
             )
-        return self._form_guild_config(result)
+        config = self._form_guild_config(result)
+        self._cache_config(guild_id, config, generation)
+        return config
+
+    async def _snapshot(self, guild_id: int) -> GuildConfigEntry:
+        """Gets the cached config row, creating the guild's rows if they do not exist yet"""
+        config = await self.get_guild_config(guild_id)
+        if config is None:
+            await GuildDataManager(self.apg).ensure_guild(guild_id)
+            config = await self.ensure_guild_config(guild_id)
+        return config
     
     async def get_prefix(self, guild_id: int) -> str:
-        result = await self.apg.fetchrow(
-            "SELECT prefix FROM guild_configs WHERE guild_id = $1", guild_id
-        )
-        return result["prefix"]
+        return (await self._snapshot(guild_id)).prefix
     
     async def set_prefix(self, guild_id: int, prefix: str) -> bool:
-        result = await self.apg.execute(
-            "UPDATE guild_configs SET prefix = $2 WHERE guild_id = $1 RETURNING *",
-            guild_id,
-            prefix,
-        )
-        return result is not None
+        updated = await self._set(guild_id, "prefix", prefix)
+        if updated:  # otherwise there was no row to save it to, and it would be gone on restart
+            self.prefixes[guild_id] = prefix
+        return updated
+
+    async def load_prefixes(self) -> None:
+        results = await self.apg.fetch(
+            """
+            SELECT guild_data.guild_id, COALESCE(guild_configs.prefix, guild_data.prefix) AS prefix
+            FROM guild_data LEFT JOIN guild_configs ON guild_configs.guild_id = guild_data.guild_id
+            LIMIT $1
+            """,
+            PREFIX_CACHE_SIZE,
+        )
+        for result in results:
+            self.prefixes[result["guild_id"]] = result["prefix"] or DEFAULT_PREFIX
+
+    async def resolve_prefix(self, guild_id: int) -> str:
+        """Gets the guild's prefix from memory, only touching the database (and creating the guild's rows) on a miss"""
+        prefix = self.prefixes.get(guild_id)
+        if prefix is None:
+            prefix = (await self._snapshot(guild_id)).prefix or DEFAULT_PREFIX
+            self.prefixes[guild_id] = prefix
+        return prefix
     
     async def get_autoresponse_functions(self, guild_id: int) -> list[str]:
-        result = await self.apg.fetchrow(
-            "SELECT autoresponse_functions FROM guild_configs WHERE guild_id = $1", guild_id
-        )
-        return result["autoresponse_functions"]
+        return list((await self._snapshot(guild_id)).autoresponse_functions)
     
     async def set_autoresponse_functions(self, guild_id: int, functions: list[str]) -> bool:
-        result = await self.apg.execute(
-            "UPDATE guild_configs SET autoresponse_functions = $2 WHERE guild_id = $1 RETURNING *",
-            guild_id,
-            functions,
-        )
-        return result is not None
+        return await self._set(guild_id, "autoresponse_functions", functions)
     
     async def get_autoresponse_enabled(self, guild_id: int) -> bool:
-        result = await self.apg.fetchrow(
-            "SELECT autoresponse_enabled FROM guild_configs WHERE guild_id = $1", guild_id
-        )
-        return result["autoresponse_enabled"]
+        return (await self._snapshot(guild_id)).autoresponse_enabled
     
     async def set_autoresponse_enabled(self, guild_id: int, enabled: bool) -> bool:
-        result = await self.apg.execute(
-            "UPDATE guild_configs SET autoresponse_enabled = $2 WHERE guild_id = $1 RETURNING *",
-            guild_id,
-            enabled,
-        )
-        return result is not None
+        return await self._set(guild_id, "autoresponse_enabled", enabled)
     
     async def get_allow_autoresponse_immunity(self, guild_id: int) -> bool:
-        result = await self.apg.fetchrow(
-            "SELECT allow_autoresponse_immunity FROM guild_configs WHERE guild_id = $1", guild_id
-        )
-        return result["allow_autoresponse_immunity"]
+        return (await self._snapshot(guild_id)).allow_autoresponse_immunity
     
     async def set_allow_autoresponse_immunity(self, guild_id: int, enabled: bool) -> bool:
-        result = await self.apg.execute(
-            "UPDATE guild_configs SET allow_autoresponse_immunity = $2 WHERE guild_id = $1 RETURNING *",
-            guild_id,
-            enabled,
-        )
-        return result is not None
+        return await self._set(guild_id, "allow_autoresponse_immunity", enabled)
     
     async def get_welcome_channel_id(self, guild_id: int) -> int:
-        result = await self.apg.fetchrow(
-            "SELECT welcome_channel_id FROM guild_configs WHERE guild_id = $1", guild_id
-        )
-        return result["welcome_channel_id"]
+        return (await self._snapshot(guild_id)).welcome_channel_id
     
     async def set_welcome_channel_id(self, guild_id: int, channel_id: int) -> bool:
-        result = await self.apg.execute(
-            "UPDATE guild_configs SET welcome_channel_id = $2 WHERE guild_id = $1 RETURNING *",
-            guild_id,
-            channel_id,
-        )
-        return result is not None
+        return await self._set(guild_id, "welcome_channel_id", channel_id)
     
     async def get_welcome_message_title(self, guild_id: int) -> str:
-        result = await self.apg.fetchrow(
-            "SELECT welcome_message_title FROM guild_configs WHERE guild_id = $1", guild_id
-        )
-        return result["welcome_message_title"]
+        return (await self._snapshot(guild_id)).welcome_message_title
     
     async def set_welcome_message_title(self, guild_id: int, title: str) -> bool:
-        result = await self.apg.execute(
-            "UPDATE guild_configs SET welcome_message_title = $2 WHERE guild_id = $1 RETURNING *",
-            guild_id,
-            title,
-        )
-        return result is not None
+        return await self._set(guild_id, "welcome_message_title", title)
     
     async def get_welcome_message_body(self, guild_id: int) -> str:
-        result = await self.apg.fetchrow(
-            "SELECT welcome_message_body FROM guild_configs WHERE guild_id = $1", guild_id
-        )
-        return result["welcome_message_body"]
+        return (await self._snapshot(guild_id)).welcome_message_body
     
     async def set_welcome_message_body(self, guild_id: int, body: str) -> bool:
-        result = await self.apg.execute(
-            "UPDATE guild_configs SET welcome_message_body = $2 WHERE guild_id = $1 RETURNING *",
-            guild_id,
-            body,
-        )
-        return result is not None
+        return await self._set(guild_id, "welcome_message_body", body)
     
     async def get_welcome_message_enabled(self, guild_id: int) -> bool:
-        result = await self.apg.fetchrow(
-            "SELECT welcome_message_enabled FROM guild_configs WHERE guild_id = $1", guild_id
-        )
-        return result["welcome_message_enabled"]
+        return (await self._snapshot(guild_id)).welcome_message_enabled
     
     async def set_welcome_message_enabled(self, guild_id: int, enabled: bool) -> bool:
-        result = await self.apg.execute(
-            "UPDATE guild_configs SET welcome_message_enabled = $2 WHERE guild_id = $1 RETURNING *",
-            guild_id,
-            enabled,
-        )
-        return result is not None
+        return await self._set(guild_id, "welcome_message_enabled", enabled)
     
     async def get_leave_channel_id(self, guild_id: int) -> int:
-        result = await self.apg.fetchrow(
-            "SELECT leave_channel_id FROM guild_configs WHERE guild_id = $1", guild_id
-        )
-        return result["leave_channel_id"]
+        return (await self._snapshot(guild_id)).leave_channel_id
     
     async def set_leave_channel_id(self, guild_id: int, channel_id: int) -> bool:
-        result = await self.apg.execute(
-            "UPDATE guild_configs SET leave_channel_id = $2 WHERE guild_id = $1 RETURNING *",
-            guild_id,
-            channel_id,
-        )
-        return result is not None
+        return await self._set(guild_id, "leave_channel_id", channel_id)
     
     async def get_leave_message_title(self, guild_id: int) -> str:
-        result = await self.apg.fetchrow(
-            "SELECT leave_message_title FROM guild_configs WHERE guild_id = $1", guild_id
-        )
-        return result["leave_message_title"]
+        return (await self._snapshot(guild_id)).leave_message_title
     
     async def set_leave_message_title(self, guild_id: int, title: str) -> bool:
-        result = await self.apg.execute(
-            "UPDATE guild_configs SET leave_message_title = $2 WHERE guild_id = $1 RETURNING *",
-            guild_id,
-            title,
-        )
-        return result is not None
+        return await self._set(guild_id, "leave_message_title", title)
     
     async def get_leave_message_body(self, guild_id: int) -> str:
-        result = await self.apg.fetchrow(
-            "SELECT leave_message_body FROM guild_configs WHERE guild_id = $1", guild_id
-        )
-        return result["leave_message_body"]
+        return (await self._snapshot(guild_id)).leave_message_body
     
     async def set_leave_message_body(self, guild_id: int, body: str) -> bool:
-        result = await self.apg.execute(
-            "UPDATE guild_configs SET leave_message_body = $2 WHERE guild_id = $1 RETURNING *",
-            guild_id,
-            body,
-        )
-        return result is not None
+        return await self._set(guild_id, "leave_message_body", body)
     
     async def get_leave_message_enabled(self, guild_id: int) -> bool:
-        result = await self.apg.fetchrow(
-            "SELECT leave_message_enabled FROM guild_configs WHERE guild_id = $1", guild_id
-        )
-        return result["leave_message_enabled"]
+        return (await self._snapshot(guild_id)).leave_message_enabled
     
     async def set_leave_message_enabled(self, guild_id: int, enabled: bool) -> bool:
-        result = await self.apg.execute(
-            "UPDATE guild_configs SET leave_message_enabled = $2 WHERE guild_id = $1 RETURNING *",
-            guild_id,
-            enabled,
-        )
-        return result is not None
+        return await self._set(guild_id, "leave_message_enabled", enabled)
     
     async def get_modlog_channel_id(self, guild_id: int) -> int:
-        result = await self.apg.fetchrow(
-            "SELECT modlog_channel_id FROM guild_configs WHERE guild_id = $1", guild_id
-        )
-        return result["modlog_channel_id"]
+        return (await self._snapshot(guild_id)).modlog_channel_id
     
     async def set_modlog_channel_id(self, guild_id: int, channel_id: int) -> bool:
-        result = await self.apg.execute(
-            "UPDATE guild_configs SET modlog_channel_id = $2 WHERE guild_id = $1 RETURNING *",
-            guild_id,
-            channel_id,
-        )
-        return result is not None
+        return await self._set(guild_id, "modlog_channel_id", channel_id)
     
     async def get_modlog_enabled(self, guild_id: int) -> bool:
-        result = await self.apg.fetchrow(
-            "SELECT modlog_enabled FROM guild_configs WHERE guild_id = $1", guild_id
-        )
-        return result["modlog_enabled"]
+        return (await self._snapshot(guild_id)).modlog_enabled
     
     async def set_modlog_enabled(self, guild_id: int, enabled: bool) -> bool:
-        result = await self.apg.execute(
-            "UPDATE guild_configs SET modlog_enabled = $2 WHERE guild_id = $1 RETURNING *",
-            guild_id,
-            enabled,
-        )
-        return result is not None
+        return await self._set(guild_id, "modlog_enabled", enabled)
     
 
 class UserConfigManager:
     def __init__(self, apg):
         self.apg = apg
+        self.autoresponse_immune: LRUCache[int, bool] = LRUCache(USER_CONFIG_CACHE_SIZE)
     
     async def get_user_config(self, user_id: int) -> dict:
         result = await self.apg.fetchrow(
@@ -857,10 +1127,15 @@ class UserConfigManager:
         return result is not None
     
     async def get_autoresponse_immune(self, user_id: int) -> bool:
+        cached = self.autoresponse_immune.get(user_id)
+        if cached is not None:
+            return cached
         result = await self.apg.fetchval(
             "SELECT autoresponse_immune FROM user_configs WHERE user_id = $1", user_id
         )
-        return result
+        immune = bool(result)  # no row means the default, not immune
+        self.autoresponse_immune[user_id] = immune
+        return immune
     
     async def set_autoresponse_immune(self, user_id: int, immune: bool) -> bool:
         result = await self.apg.execute(
@@ -868,10 +1143,97 @@ class UserConfigManager:
             user_id,
             immune,
         )
+        self.autoresponse_immune[user_id] = immune
         return result is not None
 
-    
 
+class BlacklistManager(SentinelDatabase):
+    """Keeps the blacklist in memory, kept in sync through the `blacklist` NOTIFY channel (see schema.sql)"""
+
+    CHANNEL = "blacklist"
+
+    def __init__(self, apg: asyncpg.Pool):
+        super().__init__(apg)
+        self.blacklisted: set[int] = set()
+        self._listener: asyncpg.Connection | None = None
+        self._reconnecting: asyncio.Task[None] | None = None
+
+    async def load(self) -> None:
+        # listen first so that nothing written between the fetch and the LISTEN is missed
+        await self._listen()
+        await self._refresh()
+
+    async def close(self) -> None:
+        if self._reconnecting is not None:
+            self._reconnecting.cancel()
+            self._reconnecting = None
+        if self._listener is None:
+            return
+        listener, self._listener = self._listener, None
+        listener.remove_termination_listener(self._on_terminate)
+        await listener.remove_listener(self.CHANNEL, self._on_notify)
+        await self.apg.release(listener)
+
+    def is_blacklisted(self, user_id: int) -> bool:
+        return user_id in self.blacklisted
+
+    async def add(self, user_id: int) -> None:
+        await self.apg.execute(
+            "INSERT INTO blacklist (user_id) SELECT $1 WHERE NOT EXISTS (SELECT 1 FROM blacklist WHERE user_id = $1)",
+            user_id,
+        )
+        self.blacklisted.add(user_id)
+
+    async def remove(self, user_id: int) -> None:
+        await self.apg.execute("DELETE FROM blacklist WHERE user_id = $1", user_id)
+        self.blacklisted.discard(user_id)
+
+    async def _refresh(self) -> None:
+        records = await self.apg.fetch("SELECT user_id FROM blacklist")
+        self.blacklisted = {record["user_id"] for record in records}
+
+    async def _listen(self) -> None:
+        listener: asyncpg.Connection = await self.apg.acquire()  # type: ignore
+        await listener.add_listener(self.CHANNEL, self._on_notify)
+        listener.add_termination_listener(self._on_terminate)
+        self._listener = listener
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        operation, _, user_id = payload.partition(":")
+        if operation == "INSERT":
+            self.blacklisted.add(int(user_id))
+        elif operation == "DELETE":
+            self.blacklisted.discard(int(user_id))
+        elif operation == "TRUNCATE":
+            self.blacklisted.clear()
+
+    def _on_terminate(self, connection) -> None:
+        # notifications sent while we were disconnected are lost, so reload the whole table
+        if connection is self._listener:
+            self._listener = None
+        if self._reconnecting is None:
+            # kept so the task can't be garbage collected mid-reconnect, and so close() can cancel it
+            self._reconnecting = asyncio.get_running_loop().create_task(self._reconnect(connection))
+
+    async def _reconnect(self, dead: asyncpg.Connection, delay: float = 5.0, max_delay: float = 300.0) -> None:
+        try:
+            await self.apg.release(dead)  # the pool replaces closed connections rather than reusing them
+        except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+            dead.terminate()
+        try:
+            # only done once both the listener is back and the set has been reloaded since it came back
+            while True:
+                try:
+                    if self._listener is None:
+                        await self._listen()
+                    await self._refresh()
+                    return
+                except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError):
+                    logging.warning(f"Blacklist listener reconnect failed, retrying in {delay}s")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, max_delay)
+        finally:
+            self._reconnecting = None
 
 
 class ReturnCode(Enum):
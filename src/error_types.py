@@ -84,3 +84,9 @@ class MissingPermissions(SentinelError):
     """Raised when a user doesn't have permissions to do something"""
 
     pass
+
+
+class BrowserPoolBusy(SentinelError):
+    """Raised when too many renders are already waiting for a browser"""
+
+    pass
@@ -1,5 +1,7 @@
+import logging
+
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord.app_commands import describe
 
 from ..sentinel import (
@@ -9,14 +11,69 @@ from ..sentinel import (
     SentinelView,
 )
 from ..converters import Range
-from ..command_util import ParamDefaults
+from ..command_util import Paginator, ParamDefaults
 from ..db_managers import UserDataManager
+from ..command_types import ClaimResult, CoinRanking
+from config import (
+    REWARDS,
+    LEDGER_FLUSH_INTERVAL,
+    LEDGER_SNAPSHOT_INTERVAL,
+    LEADERBOARD_REFRESH_INTERVAL,
+    LEADERBOARD_PAGE_SIZE,
+)
 
 
 class Coins(SentinelCog, emoji="\N{Banknote with Dollar Sign}"):
     """
     Sentinel's very own global currency system! You can earn by levelling up, logging in daily, gambling, and many more ways!"""
 
+    async def cog_load(self) -> None:
+        self.flush_ledger.start()
+        self.snapshot_ledger.start()
+        self.refresh_leaderboard.start()
+        await super().cog_load()
+
+    async def cog_unload(self) -> None:
+        self.flush_ledger.cancel()
+        self.snapshot_ledger.cancel()
+        self.refresh_leaderboard.cancel()
+        try:
+            await self.bot.ledger.flush()
+        except Exception:
+            logging.exception("Failed to flush the coin ledger on unload")
+        await super().cog_unload()
+
+    # failures are logged rather than raised, since an exception would stop the loop for good
+    @tasks.loop(seconds=LEDGER_FLUSH_INTERVAL)
+    async def flush_ledger(self):
+        try:
+            await self.bot.ledger.flush()
+        except Exception:
+            logging.exception("Failed to flush the coin ledger, retrying next interval")
+
+    @tasks.loop(seconds=LEDGER_SNAPSHOT_INTERVAL)
+    async def snapshot_ledger(self):
+        try:
+            await self.bot.ledger.ensure_partitions()
+            snapshotted = await self.bot.ledger.snapshot() + await self.bot.ledger.seed_snapshots()
+        except Exception:
+            logging.exception("Failed to snapshot coin balances")
+        else:
+            logging.info(f"Snapshotted {snapshotted} coin balances")
+
+    @tasks.loop(seconds=LEADERBOARD_REFRESH_INTERVAL)
+    async def refresh_leaderboard(self):
+        try:
+            await self.bot.udm.refresh_leaderboard()
+        except Exception:
+            logging.exception("Failed to refresh the coin leaderboard, retrying next interval")
+
+    @flush_ledger.before_loop
+    @snapshot_ledger.before_loop
+    @refresh_leaderboard.before_loop
+    async def before_ledger_loops(self):
+        await self.bot.wait_until_ready()
+
     @commands.hybrid_group()
     async def coins(
         self, ctx: SentinelContext, member: discord.Member = ParamDefaults.member
@@ -66,8 +123,12 @@ class Coins(SentinelCog, emoji="\N{Banknote with Dollar Sign}"):
             embed = ctx.embed(title="Cannot Give To Bots", color=discord.Color.red())
             await ctx.send(embed=embed)
             return
-        giver_bal = await self.bot.udm.get_balance(ctx.author.id)
-        rec_bal = await self.bot.udm.get_balance(member.id)
+        if member.id == ctx.author.id:
+            embed = ctx.embed(title="Cannot Give To Yourself", color=discord.Color.red())
+            await ctx.send(embed=embed)
+            return
+        balances = await self.bot.udm.get_balances(ctx.author.id, member.id)
+        giver_bal, rec_bal = balances[ctx.author.id], balances[member.id]
         if giver_bal < amount:
             embed = ctx.embed(
                 title="Transaction Failed",
@@ -101,8 +162,10 @@ class Coins(SentinelCog, emoji="\N{Banknote with Dollar Sign}"):
             raise commands.BadArgument("Invalid amount")
         if member.bot:
             raise commands.BadArgument("Cannot request from bots")
-        giver_bal = await self.bot.udm.get_balance(member.id)
-        rec_bal = await self.bot.udm.get_balance(ctx.author.id)
+        if member.id == ctx.author.id:
+            raise commands.BadArgument("Cannot request from yourself")
+        balances = await self.bot.udm.get_balances(member.id, ctx.author.id)
+        giver_bal, rec_bal = balances[member.id], balances[ctx.author.id]
         if giver_bal < amount:
             embed = ctx.embed(
                 title="Transaction Failed",
@@ -129,86 +192,83 @@ class Coins(SentinelCog, emoji="\N{Banknote with Dollar Sign}"):
     @coins.command()
     @commands.guild_only()
     async def hourly(self, ctx: SentinelContext):
-        hourly_coins = 100
-        if isinstance(ctx.author, discord.User):
-            return
-        result = await self.bot.udm.try_hourly(ctx.author.id, hourly_coins)
-        if result:
-            embed = ctx.embed(
-                title="Hourly Coins Claimed",
-                description=f"You have claimed your hourly coins and received \N{Coin}`{hourly_coins:,}`",
-            )
-        else:
-            remaining = await self.bot.udm.get_next_hourly(ctx.author.id)
-            embed = ctx.embed(
-                title="Hourly Coins Already Claimed",
-                description=f"You have already claimed your hourly coins. You can claim them again <t:{int(remaining.timestamp())}:R> at <t:{int(remaining.timestamp())}:F>",
-                color=discord.Color.red(),
-            )
-        await ctx.send(embed=embed)
+        """Claim your hourly coins"""
+        await self.send_claim(ctx, await self.bot.udm.claim_reward(ctx.author.id, "hourly"))
 
     @coins.command()
     @commands.guild_only()
     async def daily(self, ctx: SentinelContext):
         """Claim your daily coins"""
-        daily_coins = 200
-        if isinstance(ctx.author, discord.User):
-            return
-        result = await self.bot.udm.try_daily(ctx.author.id, daily_coins)
-        if result:
-            embed = ctx.embed(
-                title="Daily Coins Claimed",
-                description=f"You have claimed your daily coins and received \N{Coin}`{daily_coins:,}`",
-            )
-        else:
-            remaining = await self.bot.udm.get_next_daily(ctx.author.id)
-            embed = ctx.embed(
-                title="Daily Coins Already Claimed",
-                description=f"You have already claimed your daily coins. You can claim them again <t:{int(remaining.timestamp())}:R> at <t:{int(remaining.timestamp())}:F>",
-                color=discord.Color.red(),
-            )
-        await ctx.send(embed=embed)
+        await self.send_claim(ctx, await self.bot.udm.claim_reward(ctx.author.id, "daily"))
 
     @coins.command()
     @commands.guild_only()
     async def weekly(self, ctx: SentinelContext):
         """Claim your weekly coins"""
-        weekly_coins = 1000
-        if isinstance(ctx.author, discord.User):
-            return
-        result = await self.bot.udm.try_weekly(ctx.author.id, weekly_coins)
-        if result:
-            embed = ctx.embed(
-                title="Weekly Coins Claimed",
-                description=f"You have claimed your weekly coins and received \N{Coin}`{weekly_coins:,}`",
-            )
-        else:
-            remaining = await self.bot.udm.get_next_weekly(ctx.author.id)
-            embed = ctx.embed(
-                title="Weekly Coins Already Claimed",
-                description=f"You have already claimed your weekly coins. You can claim them again <t:{int(remaining.timestamp())}:R> at <t:{int(remaining.timestamp())}:F>",
-                color=discord.Color.red(),
-            )
-        await ctx.send(embed=embed)
-    
+        await self.send_claim(ctx, await self.bot.udm.claim_reward(ctx.author.id, "weekly"))
+
     @coins.command()
     @commands.guild_only()
     async def monthly(self, ctx: SentinelContext):
         """Claim your monthly coins"""
-        monthly_coins = 5000
-        if isinstance(ctx.author, discord.User):
+        await self.send_claim(ctx, await self.bot.udm.claim_reward(ctx.author.id, "monthly"))
+
+    @coins.command()
+    @commands.guild_only()
+    async def claim(self, ctx: SentinelContext):
+        """Claim every hourly, daily, weekly and monthly reward that is ready"""
+        results = await self.bot.udm.claim_rewards(ctx.author.id, REWARDS)
+        claimed = [result for result in results if result.claimed]
+        description = "\n".join(
+            f"**{result.period.title()}:** \N{Coin}`{result.amount:,}`" for result in claimed
+        ) or "You have no rewards ready to claim."
+        description += "\n" + "\n".join(
+            f"**{result.period.title()}** is ready <t:{int(result.next_claim.timestamp())}:R>"
+            for result in results
+            if not result.claimed
+        )
+        embed = ctx.embed(
+            title="Rewards Claimed" if claimed else "No Rewards Ready",
+            description=f"{description}\n**Balance:** \N{Coin}`{results[0].balance:,}`",
+            color=discord.Color.dark_teal() if claimed else discord.Color.red(),
+        )
+        await ctx.send(embed=embed)
+
+    @coins.command()
+    @commands.guild_only()
+    @describe(
+        member="The member to find on the leaderboard. Defaults to the author",
+    )
+    async def leaderboard(
+        self, ctx: SentinelContext, member: discord.Member = ParamDefaults.member
+    ):
+        """See who has the most coins, starting on the page with a member"""
+        total = await self.bot.udm.get_leaderboard_size()
+        if total == 0:
+            embed = ctx.embed(title="Nobody has any coins yet!", color=discord.Color.red())
+            await ctx.send(embed=embed)
             return
-        result = await self.bot.udm.try_monthly(ctx.author.id, monthly_coins)
-        if result:
+        ranking = await self.bot.udm.get_leaderboard_rank(member.id)
+        view = CoinLeaderboardPaginator(ctx, member, ranking, total, LEADERBOARD_PAGE_SIZE)
+        if ranking is not None:
+            view.current_page = (ranking.position - 1) // LEADERBOARD_PAGE_SIZE
+        await view.update()
+        embed = await view.embed(view.displayed_values)
+        message = await ctx.send(embed=embed, view=view)
+        view.message = message
+
+    async def send_claim(self, ctx: SentinelContext, result: ClaimResult):
+        name = result.period.title()
+        if result.claimed:
             embed = ctx.embed(
-                title="Monthly Coins Claimed",
-                description=f"You have claimed your monthly coins and received \N{Coin}`{monthly_coins:,}`",
+                title=f"{name} Coins Claimed",
+                description=f"You have claimed your {result.period} coins and received \N{Coin}`{result.amount:,}`",
             )
         else:
-            remaining = await self.bot.udm.get_next_monthly(ctx.author.id)
+            next_claim = int(result.next_claim.timestamp())
             embed = ctx.embed(
-                title="Monthly Coins Already Claimed",
-                description=f"You have already claimed your monthly coins. You can claim them again <t:{int(remaining.timestamp())}:R> at <t:{int(remaining.timestamp())}:F>",
+                title=f"{name} Coins Already Claimed",
+                description=f"You have already claimed your {result.period} coins. You can claim them again <t:{next_claim}:R> at <t:{next_claim}:F>",
                 color=discord.Color.red(),
             )
         await ctx.send(embed=embed)
@@ -254,8 +314,10 @@ class GiveCoinsConfirmation(SentinelView):
             )
             await itx.response.send_message(embed=embed, ephemeral=True)
             return
+        self.stop()  # before awaiting anything, so a double click can't send the coins twice
+        # the balance shown when the transaction was proposed may be out of date, the transfer itself checks again
         successful, giver_bal, rec_bal = await self.usm.give_balance(
-            self.giver.id, self.receiver.id, self.amount, True
+            self.giver.id, self.receiver.id, self.amount
         )
         if successful:
             embed = self.ctx.embed(
@@ -266,7 +328,9 @@ class GiveCoinsConfirmation(SentinelView):
         else:
             embed = self.ctx.embed(
                 title="Transaction Failed",
-                description="Something went wrong, please try again later.\nYour balance has not been affected.",
+                description=f"`{self.giver}` no longer has enough \N{Coin} to complete this transaction.\n"
+                f"`{self.giver}`'s Balance: \N{Coin}`{giver_bal:,}`\nYour balance has not been affected.",
+                color=discord.Color.red(),
             )
             await itx.response.send_message(embed=embed)
 
@@ -282,6 +346,7 @@ class GiveCoinsConfirmation(SentinelView):
             )
             await itx.response.send_message(embed=embed, ephemeral=True)
             return
+        self.stop()
         embed = self.ctx.embed(
             title=f"Transaction Declined by `{itx.user}`",
             description="The transaction has been cancelled.\nYour balance has not been affected.",
@@ -289,5 +354,46 @@ class GiveCoinsConfirmation(SentinelView):
         await itx.response.send_message(embed=embed)
 
 
+class CoinLeaderboardPaginator(Paginator):
+    """Fetches the coin leaderboard one page at a time as the user navigates"""
+
+    def __init__(
+        self,
+        ctx: SentinelContext,
+        member: discord.Member,
+        ranking: CoinRanking | None,
+        total: int,
+        page_size: int,
+    ):
+        super().__init__(ctx, (), page_size)
+        self.member = member
+        self.ranking = ranking
+        self.total = total
+        self.max_page = max(0, (total - 1) // page_size)
+        self.pages: dict[int, tuple[CoinRanking, ...]] = {}
+
+    async def get_page(self, page: int) -> tuple[CoinRanking, ...]:
+        if page not in self.pages:
+            self.pages[page] = tuple(
+                await self.ctx.bot.udm.get_leaderboard_page(page * self.page_size, self.page_size)
+            )
+        return self.pages[page]
+
+    async def embed(self, value_range: tuple[CoinRanking]) -> discord.Embed:
+        desc = ""
+        for ranking in value_range:
+            line = f"`{ranking.position}:` <@{ranking.user_id}> | \N{Coin}`{ranking.balance:,}`"
+            desc += f"**{line}**\n" if ranking.user_id == self.member.id else f"{line}\n"
+        if self.ranking is None:
+            desc += f"\n`{self.member}` isn't on the leaderboard yet"
+        else:
+            desc += f"\n`{self.member}` is `#{self.ranking.position:,}` of `{self.total:,}`"
+        embed = self.ctx.embed(
+            title="Coin Leaderboard",
+            description=desc,
+        )
+        return embed
+
+
 async def setup(bot: Sentinel):
     await bot.add_cog(Coins(bot))
@@ -5,7 +5,7 @@ from typing import Optional, Sequence
 
 from ..sentinel import NumT, Sentinel, SentinelCog, SentinelContext
 from ..command_util import Paginator, ParamDefaults
-from .events import Events
+from .events import AutoresponseManager
 
 
 class Dev(SentinelCog, emoji="\N{Personal Computer}", hidden=True):
@@ -51,10 +51,7 @@ class Dev(SentinelCog, emoji="\N{Personal Computer}", hidden=True):
                         description=description,
                     )
 
-            opts = tuple(
-                user["user_id"]
-                for user in await self.bot.apg.fetch("SELECT user_id FROM blacklist")
-            )
+            opts = tuple(sorted(self.bot.blm.blacklisted))
             view = BLDisplay(ctx, opts, 10)
             embed = await view.embed(view.displayed_values)
             message = await ctx.send(embed=embed, view=view)
@@ -68,7 +65,7 @@ class Dev(SentinelCog, emoji="\N{Personal Computer}", hidden=True):
     async def add(self, ctx: SentinelContext, user: discord.User):
         """Add a user to the blacklist"""
         await self.bot.udm.ensure_user(user.id)
-        await self.bot.apg.execute("INSERT INTO blacklist VALUES ($1)", user.id)
+        await self.bot.blm.add(user.id)
         embed = ctx.embed(
             title="Successful Blacklist \N{White Heavy Check Mark}",
             description=f"Blacklisted {user.mention} | `{user}`",
@@ -79,7 +76,7 @@ class Dev(SentinelCog, emoji="\N{Personal Computer}", hidden=True):
     @commands.is_owner()
     async def remove(self, ctx: SentinelContext, user: discord.User):
         """Remove a user from the blacklist"""
-        await self.bot.apg.execute("DELETE FROM blacklist WHERE user_id = $1", user.id)
+        await self.bot.blm.remove(user.id)
         embed = ctx.embed(
             title="Successful Whitelist \N{White Heavy Check Mark}",
             description=f"Whitelisted {user.mention} | `{user}`",
@@ -128,7 +125,7 @@ class Dev(SentinelCog, emoji="\N{Personal Computer}", hidden=True):
         text: discord.Message = await self.bot.wait_for("message", check=lambda m: m.author == ctx.author)
         await ctx.send("send the trigger")
         trigger: discord.Message = await self.bot.wait_for("message", check=lambda m: m.author == ctx.author)
-        await Events(self.bot).process_code(text.content.splitlines(), trigger)
+        await AutoresponseManager(self.bot).process_code(text.content.splitlines(), trigger)
 
 
 
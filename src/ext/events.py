@@ -1,11 +1,38 @@
-from typing import Callable, no_type_check
+import abc
+import logging
+import string
+from typing import Callable, Iterator, Mapping, no_type_check
 import discord
 from discord.ext import commands
+from discord.ext import tasks
 
+from ..caches import LRUCache
+from ..text_index import AhoCorasick
 from ..sentinel import SentinelContext, SentinelCog, Sentinel, SentinelMessageCacheValue
+from config import GUILD_CONFIG_CACHE_SIZE, SNIPE_STORE_FLUSH_INTERVAL
 
 
 class Events(SentinelCog, emoji="\N{ELECTRIC LIGHT BULB}", hidden=True):
+    def __init__(self, bot: Sentinel):
+        super().__init__(bot)
+        self.autoresponses = AutoresponseManager(bot)
+
+    async def cog_load(self) -> None:
+        if self.bot.snipe_store is not None:
+            self.flush_snipes.start()
+        await super().cog_load()
+
+    async def cog_unload(self) -> None:
+        self.flush_snipes.cancel()
+        if self.bot.snipe_store is not None:
+            await self.bot.snipe_store.flush()
+        await super().cog_unload()
+
+    @tasks.loop(seconds=SNIPE_STORE_FLUSH_INTERVAL)
+    async def flush_snipes(self):
+        if self.bot.snipe_store is not None:
+            await self.bot.snipe_store.flush()
+
     @commands.Cog.listener()
     async def on_guild_join(self, guild: discord.Guild):
         await self.bot.tree.sync(guild=discord.Object(guild.id))
@@ -25,23 +52,24 @@ class Events(SentinelCog, emoji="\N{ELECTRIC LIGHT BULB}", hidden=True):
         guild_opt = await self.bot.gcm.get_autoresponse_enabled(message.guild.id)
         if guild_opt:
             discord.Interaction.message
-            await AutoresponseManager(self.bot).process_autoresponse_functions(message)
+            await self.autoresponses.process_autoresponse_functions(message)
         
 
     @commands.Cog.listener()
     async def on_message_delete(self, message: discord.Message):
         if message.author.bot or not message.guild:
             return
-        return self.bot.deleted_message_cache.add(
-            (message.guild.id, message.channel.id),
-            SentinelMessageCacheValue(
-                message_id=message.id,
-                author_id=message.author.id,
-                content=message.content,
-                attachment_urls={attachment.url for attachment in message.attachments},
-                timestamp=int(message.created_at.timestamp())
-            ).dismantle()
-        )
+        key = (message.guild.id, message.channel.id)
+        value = SentinelMessageCacheValue(
+            message_id=message.id,
+            author_id=message.author.id,
+            content=message.content,
+            attachment_urls={attachment.url for attachment in message.attachments},
+            timestamp=int(message.created_at.timestamp())
+        ).dismantle()
+        self.bot.deleted_message_cache.add(key, value)
+        if self.bot.snipe_store is not None:
+            self.bot.snipe_store.add(key, value)
     
     @commands.Cog.listener()
     async def on_message_edit(self, before: discord.Message, after: discord.Message):
@@ -55,103 +83,271 @@ class Events(SentinelCog, emoji="\N{ELECTRIC LIGHT BULB}", hidden=True):
 class AutoresponseManager:
     def __init__(self, bot: Sentinel):
         self.bot = bot
-        self.on_guild_join = Events(self.bot).on_guild_join
+        # guild_id -> (the snapshot's function list it was compiled from, compiled program)
+        self.programs: LRUCache[int, tuple[list[str], AutoresponseProgram]] = LRUCache(GUILD_CONFIG_CACHE_SIZE)
 
     async def process_autoresponse_functions(self, message: discord.Message):
         if message.guild is None:
             return
-        functions: list[str] = await self.bot.apg.fetchval("SELECT autoresponse_functions FROM guild_configs WHERE guild_id = $1", message.guild.id)
-        if functions is None:
-            await self.on_guild_join(message.guild)
+        program = await self.get_program(message.guild.id)
+        if not program.statements:
             return
-        for function in functions:
-            code = str(function[function.index(";") + 1:]).strip().splitlines()
-            await self.process_code(code, message)
-            
+        await self.run_program(program, message)
 
-    async def process_code(self, code: list[str], message: discord.Message):
-        await self.bot.ucm.ensure_user_config(message.author.id)
+    async def get_program(self, guild_id: int) -> "AutoresponseProgram":
+        config = await self.bot.gcm.ensure_guild_config(guild_id)
+        cached = self.programs.get(guild_id)
+        # every set_* drops the config snapshot, so a new function list means the program is stale
+        if cached is not None and cached[0] is config.autoresponse_functions:
+            return cached[1]
+        program = AutoresponseProgram.compile_functions(config.autoresponse_functions)
+        self.programs[guild_id] = (config.autoresponse_functions, program)
+        return program
+
+    async def run_program(self, program: "AutoresponseProgram", message: discord.Message):
         user_opt = await self.bot.ucm.get_autoresponse_immune(message.author.id)
         if user_opt:
             return
-        for line in code:
-            args = line.split(" ")
-            if args[0] == "send":
-                await self.process_send(args, message)
-            elif args[0] == "reply":
-                await self.process_reply(args, message)
-            elif args[0] == "if":
-                await self.process_if(args, message)
-            elif args[0] == "delete":
-                await self.process_delete(args, message)
-    
-    async def replace_keywords(self, text: str, message: discord.Message) -> str:
-        return text.format(**await get_message_context(message))
-    
-    async def process_send(self, args: list[str], message: discord.Message):
-        channel_id = int(args[1])
-        text = " ".join(args[2:])
-        text = await self.replace_keywords(text, message)
+        statements = program.candidates(message.content)
+        if not statements:
+            return
+        context = MessageContext(message)
+        for statement in statements:
+            await statement.run(self, message, context)
+
+    async def process_code(self, code: list[str], message: discord.Message):
+        await self.run_program(AutoresponseProgram.compile_lines(code), message)
+
+    async def send(self, channel_id: int, text: str, message: discord.Message):
         channel = self.bot.get_channel(channel_id)
         if channel is None:
             return
         if isinstance(channel, discord.TextChannel) and message.guild and channel.permissions_for(message.guild.me).send_messages:
             await channel.send(text)
-        
-    async def process_reply(self, args: list[str], message: discord.Message):
-        # unlike send, reply just replies to the message
-        text = " ".join(args[1:])
-        text = await self.replace_keywords(text, message)
-        
+
+    async def reply(self, text: str, message: discord.Message):
         if isinstance(message.channel, discord.TextChannel) and message.guild and message.channel.permissions_for(message.guild.me).send_messages:
             await message.reply(text)
-        
-    async def process_delete(self, args: list[str], message: discord.Message):
+
+    async def delete(self, message: discord.Message):
         try:
             await message.delete()
         except discord.Forbidden:
             pass
 
-    async def process_if(self, args: list[str], message: discord.Message):
+
+class Template:
+    """A piece of autoresponse code with `{keyword}` fields, parsed once"""
+
+    _formatter = string.Formatter()
+
+    def __init__(self, text: str):
+        self.text = text
+        # raises ValueError on unbalanced braces
+        self.parts: list[tuple[str, str | None, str, str | None]] = list(self._formatter.parse(text))
+        self.keys: frozenset[str] = frozenset(
+            field for _, field, _, _ in self.parts if field is not None
+        )
+        self.needs_last_message = not self.keys.isdisjoint(LAST_MESSAGE_KEYS)
+        self.literal: str | None = None
+        if not self.keys:
+            self.literal = "".join(literal for literal, _, _, _ in self.parts)
+
+    def render(self, context: Mapping[str, int | str]) -> str:
+        if self.literal is not None:
+            return self.literal
+        rendered: list[str] = []
+        for literal, field, spec, conversion in self.parts:
+            rendered.append(literal)
+            if field is None:
+                continue
+            if field not in context:
+                rendered.append("{" + field + "}")
+                continue
+            value = self._formatter.convert_field(context[field], conversion)
+            rendered.append(format(value, spec or ""))
+        return "".join(rendered)
+
+
+class Operand:
+    """One side of an `if` condition. Quotes are optional, and numeric values are compared as integers"""
+
+    def __init__(self, text: str):
+        text = text.strip()
+        if len(text) >= 2 and text[0] == text[-1] and text[0] in "\"'":
+            text = text[1:-1]
+        self.template = Template(text)
+        self.keys = self.template.keys
+        self.field: str | None = None
+        if len(self.template.parts) == 1 and not self.template.parts[0][0]:
+            self.field = self.template.parts[0][1]
+
+    def evaluate(self, context: Mapping[str, int | str]) -> str | int:
+        value = self.template.render(context)
+        try:
+            return int(value)
+        except ValueError:
+            return value
+
+
+class Statement(abc.ABC):
+    keys: frozenset[str] = frozenset()
+
+    def trigger(self) -> str | None:
+        """A string which must occur in the casefolded message content for this statement to do anything"""
+        return None
+
+    @abc.abstractmethod
+    async def run(self, manager: AutoresponseManager, message: discord.Message, context: "MessageContext") -> None:
+        pass
+
+
+class SendStatement(Statement):
+    def __init__(self, channel_id: int, text: Template):
+        self.channel_id = channel_id
+        self.text = text
+        self.keys = text.keys
+
+    async def run(self, manager: AutoresponseManager, message: discord.Message, context: "MessageContext") -> None:
+        if self.text.needs_last_message:
+            await context.fetch_last_message()
+        await manager.send(self.channel_id, self.text.render(context), message)
+
+
+class ReplyStatement(Statement):
+    def __init__(self, text: Template):
+        self.text = text
+        self.keys = text.keys
+
+    async def run(self, manager: AutoresponseManager, message: discord.Message, context: "MessageContext") -> None:
+        if self.text.needs_last_message:
+            await context.fetch_last_message()
+        await manager.reply(self.text.render(context), message)
+
+
+class DeleteStatement(Statement):
+    async def run(self, manager: AutoresponseManager, message: discord.Message, context: "MessageContext") -> None:
+        await manager.delete(message)
+
+
+class IfStatement(Statement):
+    def __init__(self, left: Operand, operator: str, right: Operand, then: Statement):
+        self.left = left
+        self.operator = operator
+        self.compare = VALID_OPERATORS[operator]
+        self.right = right
+        self.then = then
+        self.keys = left.keys | right.keys | then.keys
+        self.needs_last_message = left.template.needs_last_message or right.template.needs_last_message
+
+    def trigger(self) -> str | None:
+        content_side = CONTENT_TRIGGER_OPERATORS.get(self.operator)
+        if content_side is None:
+            return None
+        for side, content, literal in (("left", self.left, self.right), ("right", self.right, self.left)):
+            if content_side not in (side, "either") or content.field != "message_content" or literal.keys:
+                continue
+            value = literal.evaluate({})
+            # numbers are compared after int coercion, which can reshape the text (`0042` -> `42`)
+            if isinstance(value, int) or not value:
+                return None
+            return value.casefold()
+        return None
+
+    async def run(self, manager: AutoresponseManager, message: discord.Message, context: "MessageContext") -> None:
+        if self.needs_last_message:
+            await context.fetch_last_message()
+        if self.compare(self.left.evaluate(context), self.right.evaluate(context)):
+            await self.then.run(manager, message, context)
+
+
+class AutoresponseProgram:
+    def __init__(self, statements: list[Statement]):
+        self.statements = statements
+
+        # statements gated on a literal in the message content only run when the index finds that literal
+        self.ungated: set[int] = set()
+        triggers: list[str] = []
+        self.trigger_statements: list[int] = []
+        for index, statement in enumerate(statements):
+            trigger = statement.trigger()
+            if trigger is None:
+                self.ungated.add(index)
+            else:
+                triggers.append(trigger)
+                self.trigger_statements.append(index)
+        self.matcher: AhoCorasick | None = AhoCorasick(triggers) if triggers else None
+
+    def candidates(self, content: str) -> list[Statement]:
+        """The statements which might do something for this message content, in program order"""
+        if self.matcher is None:
+            return self.statements
+        found = self.matcher.search(content.casefold())
+        if not found:
+            return [self.statements[index] for index in sorted(self.ungated)]
+        indices = self.ungated.union(self.trigger_statements[pattern] for pattern in found)
+        return [self.statements[index] for index in sorted(indices)]
+
+    @classmethod
+    def compile_functions(cls, functions: list[str]) -> "AutoresponseProgram":
+        """Compiles stored `name;code` functions into a single program"""
+        lines: list[str] = []
+        for function in functions:
+            lines.extend(function[function.find(";") + 1:].strip().splitlines())
+        return cls.compile_lines(lines)
+
+    @classmethod
+    def compile_lines(cls, lines: list[str]) -> "AutoresponseProgram":
+        statements: list[Statement] = []
+        for line in lines:
+            try:
+                statement = compile_statement(line)
+            except ValueError:
+                logging.debug(f"Skipping invalid autoresponse line: {line!r}")
+                continue
+            if statement is not None:
+                statements.append(statement)
+        return cls(statements)
+
+
+def compile_statement(line: str) -> Statement | None:
+    """Compiles a single line of autoresponse code. Raises ValueError on malformed lines"""
+    line = line.strip()
+    command, _, rest = line.partition(" ")
+    if command == "send":
+        channel_id, _, text = rest.partition(" ")
+        return SendStatement(int(channel_id), Template(text))
+    if command == "reply":
+        return ReplyStatement(Template(rest))
+    if command == "delete":
+        return DeleteStatement()
+    if command == "if" or command.startswith("if("):
         # if(message_content == hello there) send 123456789 hello world
         #                    ^^ the operator divides the statement into two parts
-        line = " ".join(args)
-        statement = line[line.index("(")+1:line.index(")")]
-        post = line[line.index(")")+1:].strip()
-        
+        condition = line[line.index("(") + 1:line.index(")")]
+        then = compile_statement(line[line.index(")") + 1:])
+        if then is None:
+            raise ValueError("if statement has nothing to run")
+        index, operator = find_operator(condition)
+        left = Operand(condition[:index])
+        right = Operand(condition[index + len(operator):])
+        return IfStatement(left, operator, right, then)
+    return None
+
+
+def find_operator(condition: str) -> tuple[int, str]:
+    """Finds the first operator in a condition, preferring the longest one (`!<?>` over `<?>` over `?>`)"""
+    best: tuple[int, str] | None = None
+    for operator in VALID_OPERATORS:
+        index = condition.find(operator)
+        if index == -1:
+            continue
+        if best is None or index < best[0] or (index == best[0] and len(operator) > len(best[1])):
+            best = (index, operator)
+    if best is None:
+        raise ValueError(f"No operator in condition: {condition!r}")
+    return best
 
-        for operator in VALID_OPERATORS.keys():
-            if operator in statement:
-                left, right = statement.split(operator)
-                left = left.strip()
-                right = right.strip()
-                l = await self.replace_keywords(left, message)
-                r = await self.replace_keywords(right, message)
-                try:
-                    result = eval(l)
-                    if result is not None:
-                        l = result
-                        try:
-                            l = int(l)
-                        except ValueError:
-                            pass
-                except SyntaxError:
-                    pass
-                    
-                try:
-                    result = eval(r)
-                    if result is not None:
-                        r = result
-                        try:
-                            r = int(r)
-                        except ValueError:
-                            pass
-                except SyntaxError:
-                    pass
-                if VALID_OPERATORS[operator](l, r):
-                    await self.process_code([post], message)
-                    
-    
 
 class Operators:
     @staticmethod
@@ -263,34 +459,84 @@ VALID_OPERATORS: dict[str, Callable[[str | int, str | int], bool]] = {
     "!?<": Operators.does_not_end_with_casefold
 }
 
-async def get_message_context(message: discord.Message, get_last: bool = False) -> dict[str, int | str]:
-    if get_last: 
-        last_message = [m async for m in message.channel.history(limit=2)][1]
-    else:
-        last_message = message
-    context: dict[str, int | str] = {
-        "message_content": f"\"{message.content}\"",
-        "message_id": message.id,
-        "message_link": f"\"{message.jump_url}\"",
-        "author_mention": f"\"{message.author.mention}\"",
-        "author_name": f"\"{message.author.name}\"",
-        "author_id": message.author.id,
-        "author_full": f"\"{message.author}\"",
-        "channel_mention": f"\"{message.channel.mention}\"", # type: ignore
-        "channel_name": f"\"{message.channel.name}\"", # type: ignore
-        "channel_id": message.channel.id,
-        "guild_name": f"\"{message.guild.name}\"", # type: ignore
-        "guild_id": message.guild.id, # type: ignore
-
-        "last_message_content": f"\"{last_message.content}\"", # type: ignore
-        "last_message_id": last_message.id, # type: ignore
-        "last_message_link": f"\"{last_message.jump_url}\"", # type: ignore
-        "last_author_mention": f"\"{last_message.author.mention}\"", # type: ignore
-        "last_author_name": f"\"{last_message.author.name}\"", # type: ignore
-        "last_author_id": last_message.author.id, # type: ignore
-        "last_author_full": f"{last_message.author}", # type: ignore
+# which operand of a positive operator has to be the message content for the other to be a required substring
+CONTENT_TRIGGER_OPERATORS: dict[str, str] = {
+    "==": "either",
+    "<.>": "right",
+    "<?>": "right",
+    ".>": "left",
+    "?>": "left",
+    ".<": "left",
+    "?<": "left",
+}
+
+
+class MessageContext(Mapping[str, int | str]):
+    """The keywords available to autoresponse templates, each computed the first time it is used"""
+
+    RESOLVERS: dict[str, Callable[[discord.Message], int | str]] = {
+        "message_content": lambda m: m.content,
+        "message_id": lambda m: m.id,
+        "message_link": lambda m: m.jump_url,
+        "author_mention": lambda m: m.author.mention,
+        "author_name": lambda m: m.author.name,
+        "author_id": lambda m: m.author.id,
+        "author_full": lambda m: str(m.author),
+        "channel_mention": lambda m: m.channel.mention,  # type: ignore
+        "channel_name": lambda m: m.channel.name,  # type: ignore
+        "channel_id": lambda m: m.channel.id,
+        "guild_name": lambda m: m.guild.name,  # type: ignore
+        "guild_id": lambda m: m.guild.id,  # type: ignore
+    }
+    # last_message_content, last_author_name, etc. resolve against the previous message in the channel
+    LAST_MESSAGE_RESOLVERS: dict[str, str] = {
+        "last_message_content": "message_content",
+        "last_message_id": "message_id",
+        "last_message_link": "message_link",
+        "last_author_mention": "author_mention",
+        "last_author_name": "author_name",
+        "last_author_id": "author_id",
+        "last_author_full": "author_full",
     }
-    return context
+
+    def __init__(self, message: discord.Message):
+        self.message = message
+        self.last_message: discord.Message | None = None
+        self._values: dict[str, int | str] = {}
+
+    async def fetch_last_message(self) -> None:
+        """Fetches the previous message in the channel, at most once"""
+        if self.last_message is not None:
+            return
+        history = [m async for m in self.message.channel.history(limit=2)]
+        self.last_message = history[1] if len(history) > 1 else self.message
+
+    def __getitem__(self, key: str) -> int | str:
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+        if key in self.RESOLVERS:
+            value = self.RESOLVERS[key](self.message)
+        elif key in self.LAST_MESSAGE_RESOLVERS:
+            value = self.RESOLVERS[self.LAST_MESSAGE_RESOLVERS[key]](self.last_message or self.message)
+        else:
+            raise KeyError(key)
+        self._values[key] = value
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.RESOLVERS or key in self.LAST_MESSAGE_RESOLVERS
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.RESOLVERS
+        yield from self.LAST_MESSAGE_RESOLVERS
+
+    def __len__(self) -> int:
+        return len(self.RESOLVERS) + len(self.LAST_MESSAGE_RESOLVERS)
+
+
+LAST_MESSAGE_KEYS: frozenset[str] = frozenset(MessageContext.LAST_MESSAGE_RESOLVERS)
 
 
 async def setup(bot):
@@ -3,17 +3,16 @@ import datetime
 from enum import Enum
 import random
 from typing import Optional
+import aiohttp
 import bs4
 from bs4.element import Tag
 import discord
 from discord.ext import commands
 from discord.ext import tasks
 from discord.app_commands import describe
-import asyncio
-from selenium.webdriver.common.by import By
 
 from ..command_util import Paginator
-from ..sentinel import Sentinel, SentinelCog, SentinelContext, SentinelView
+from ..sentinel import PageSource, Sentinel, SentinelCog, SentinelContext, SentinelView
 
 from ..converters import Range, URLCleanParam, URLCleanAnnotation
 
@@ -35,8 +34,6 @@ class MemeDroid(SentinelCog):
     async def user(self, ctx: SentinelContext, *, username=URLCleanParam):
         """Gets detailed information about a user"""
         url_base = f"https://www.memedroid.com/user/view/{username}"
-        page_content = await self.bot.driver.get(url_base)
-
         profile_stats_selector = (
             "div#user-profile-main-container.user-profile-main-container"
         )
@@ -50,7 +47,17 @@ class MemeDroid(SentinelCog):
 
         follow_selector = "div#user-profile-followers-info-container"
 
-        soup = bs4.BeautifulSoup(page_content, "html.parser")
+        # profiles are rendered server side, so the browser is only needed if that ever changes
+        try:
+            _, soup = await self.bot.scrape(
+                PageSource(url=url_base, selector=profile_stats_selector),
+                PageSource(url=url_base, selector=profile_stats_selector, needs_js=True),
+            )
+        except aiohttp.ClientResponseError as e:
+            if e.status == 404:
+                raise commands.BadArgument(f"Cannot find MemeDroid user `{username}`")
+            raise
+
         profile_stats = soup.select_one(profile_stats_selector)
         if profile_stats is None:
             return
@@ -103,13 +110,6 @@ class UserButtons(SentinelView):
         if not await self.check_status(itx, self.view_posts, UserMenuStatus.POSTS):
             return
 
-        upload_button_path = "/html/body/div[5]/div/div[2]/section/ul/li[1]/a"  # lmao copilot how did you know this
-        upload_button = self.ctx.bot.driver.driver.find_element(
-            By.XPATH, upload_button_path
-        )
-        upload_button.click()
-        await asyncio.sleep(0.5)
-
         posts_selector = "div > article"
         posts = self.soup.select(posts_selector)
         posts = [
@@ -136,13 +136,6 @@ class UserButtons(SentinelView):
         if not await self.check_status(itx, self.view_stats, UserMenuStatus.STATS):
             return
 
-        stats_button_path = "/html/body/div[5]/div/div[2]/section/ul/li[2]/a"
-        stats_button = self.ctx.bot.driver.driver.find_element(
-            By.XPATH, stats_button_path
-        )
-        stats_button.click()
-        await asyncio.sleep(0.1)
-
         stats_selector = "ul.stats-list > li.row"
         stats = self.soup.select(stats_selector)
         formatted_stats: dict[str, str] = {stat.select_one("div").text: stat.select_one("div > span.size-15").text for stat in stats}  # type: ignore
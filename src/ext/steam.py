@@ -1,17 +1,61 @@
 import datetime
+import json
+from typing import Any, Optional
 from bs4 import BeautifulSoup, Tag
 import discord
 from discord.ext import commands
 
+from ..caches import BatchLoader
 from ..command_util import Paginator
-from ..sentinel import Sentinel, SentinelCog, SentinelContext, SentinelView
+from ..sentinel import CachePolicy, Sentinel, SentinelCog, SentinelContext, SentinelView
 
 from ..converters import Range, URLCleanParam, URLCleanAnnotation
 from ..command_types import SteamUser
 
+from config import (
+    STEAM_BATCH_DELAY,
+    STEAM_BATCH_SIZE,
+    STEAM_PROFILE_CACHE_TTL,
+    STEAM_PROFILE_NEGATIVE_TTL,
+    STEAM_PROFILE_STALE_TTL,
+)
 from env import STEAM_API_KEY
 
+PLAYER_SUMMARIES_URL = "http://api.steampowered.com/ISteamUser/GetPlayerSummaries/v0002/"
+# profiles are cached one by one, and unknown ids are cached as null
+PROFILE_POLICY = CachePolicy(
+    ttl=STEAM_PROFILE_CACHE_TTL,
+    stale_ttl=STEAM_PROFILE_STALE_TTL,
+    negative_ttl=STEAM_PROFILE_NEGATIVE_TTL,
+    is_negative=lambda body: body == b"null",
+)
+
+
 class Steam(SentinelCog, emoji="\N{Video Game}"):
+    def __init__(self, bot: Sentinel):
+        super().__init__(bot)
+        self.profiles: BatchLoader[int, dict[str, Any]] = BatchLoader(
+            self.fetch_profiles, max_size=STEAM_BATCH_SIZE, delay=STEAM_BATCH_DELAY
+        )
+
+    async def fetch_profiles(self, ids: list[int]) -> dict[int, dict[str, Any]]:
+        """One GetPlayerSummaries call for every id gathered by `self.profiles`"""
+        params = {
+            "key": STEAM_API_KEY,
+            "steamids": ",".join(map(str, ids)),
+        }
+        # each profile is cached on its own by `get_profile`, so the combined response isn't
+        players = await self.bot.session.getjson(
+            PLAYER_SUMMARIES_URL, params=params, get_cache=False, set_cache=False, route=["response", "players"]
+        )
+        return {int(player["steamid"]): player for player in players}
+
+    async def get_profile(self, id: int) -> Optional[dict[str, Any]]:
+        async def fetch() -> bytes:
+            return json.dumps(await self.profiles.load(id)).encode()
+
+        return json.loads(await self.bot.session.memoize(f"steam:profile:{id}", fetch, policy=PROFILE_POLICY))
+
     @commands.hybrid_group()
     async def steam(self, ctx: SentinelContext):
         """Steam commands"""
@@ -19,12 +63,9 @@ class Steam(SentinelCog, emoji="\N{Video Game}"):
 
     @steam.command()
     async def user(self, ctx: SentinelContext, id: int = commands.param(converter=lambda x: int(x))):
-        url = "http://api.steampowered.com/ISteamUser/GetPlayerSummaries/v0002/"
-        params = {
-            "key": STEAM_API_KEY,
-            "steamids": id,
-        }
-        data = await self.bot.session.getjson(url, params=params, route=["response", "players", 0], cache=True)
+        data = await self.get_profile(id)
+        if data is None:
+            raise commands.BadArgument(f"Cannot find a Steam user with ID `{id}`")
         user = SteamUser(
             avatar_url=data["avatarfull"],
             username=data["realname"],
@@ -1,20 +1,64 @@
 from typing import Optional
+import logging
 import discord
 from discord.ext import commands
+from discord.ext import tasks
 from discord.app_commands import describe
 
 
 from ..sentinel import Sentinel, SentinelContext, SentinelCog, SentinelErrors
-from ..command_util import Paginator, fuzz
+from ..command_util import Paginator
 from ..db_managers import ReturnCode
-from ..command_types import TagEntry, MetaTagEntry
+from ..command_types import TagEntry, MetaTagEntry, TagRanking
 from ..converters import LowerStringParam, StringAnnotation, OptionalLowerStringParam
-from config import RESERVED_TAG_NAMES, TAG_NAME_REGEX
+from config import (
+    RESERVED_TAG_NAMES,
+    TAG_NAME_REGEX,
+    TAG_SEARCH_LIMIT,
+    TAG_USES_FLUSH_INTERVAL,
+    LEADERBOARD_REFRESH_INTERVAL,
+    LEADERBOARD_PAGE_SIZE,
+)
 import re
 
 
 class Tag(SentinelCog, emoji="\N{Label}"):
     """Store text snippets for later use"""
+
+    async def cog_load(self) -> None:
+        self.flush_tag_uses.start()
+        self.refresh_leaderboard.start()
+        await super().cog_load()
+
+    async def cog_unload(self) -> None:
+        self.flush_tag_uses.cancel()
+        self.refresh_leaderboard.cancel()
+        try:
+            await self.bot.tdm.flush_tag_uses()
+        except Exception:
+            logging.exception("Failed to flush tag uses on unload")
+        await super().cog_unload()
+
+    @tasks.loop(seconds=TAG_USES_FLUSH_INTERVAL)
+    async def flush_tag_uses(self):
+        # logged rather than raised, since an exception would stop the loop and the counts would never be retried
+        try:
+            await self.bot.tdm.flush_tag_uses()
+        except Exception:
+            logging.exception("Failed to flush tag uses, retrying next interval")
+
+    @tasks.loop(seconds=LEADERBOARD_REFRESH_INTERVAL)
+    async def refresh_leaderboard(self):
+        try:
+            await self.bot.tdm.refresh_leaderboard()
+        except Exception:
+            logging.exception("Failed to refresh the tag leaderboard, retrying next interval")
+
+    @flush_tag_uses.before_loop
+    @refresh_leaderboard.before_loop
+    async def before_flush_tag_uses(self):
+        await self.bot.wait_until_ready()
+
     @commands.hybrid_group()
     @commands.guild_only()
     async def tag(
@@ -122,10 +166,10 @@ class Tag(SentinelCog, emoji="\N{Label}"):
         return await self.list_member_tags(ctx, member)
 
     async def list_guild_tags(self, ctx: SentinelContext):
-        tags = tuple(await self.bot.tdm.get_tags_in_guild(ctx.guild.id))
-        if len(tags) == 0:
+        total = await self.bot.tdm.count_tags_in_guild(ctx.guild.id)
+        if total == 0:
             raise SentinelErrors.TagNotFound("No tags found")
-        view = GuildTagsPaginator(ctx, tags, 10)
+        view = GuildTagsPaginator(ctx, total, 10)
         await view.update()
         embed = await view.embed(view.displayed_values)
         message = await ctx.send(embed=embed, view=view)
@@ -141,6 +185,29 @@ class Tag(SentinelCog, emoji="\N{Label}"):
         message = await ctx.send(embed=embed, view=view)
         view.message = message
 
+    @tag.command()
+    @commands.guild_only()
+    @describe(tag_name="The tag to find on the leaderboard")
+    async def leaderboard(
+        self, ctx: SentinelContext, tag_name: StringAnnotation = OptionalLowerStringParam
+    ):
+        """See the most used tags in this server, starting on the page with a tag"""
+        total = await self.bot.tdm.get_leaderboard_size(ctx.guild.id)
+        if total == 0:
+            raise SentinelErrors.TagNotFound("No tags have been used yet")
+        ranking = None
+        if tag_name is not None:
+            ranking = await self.bot.tdm.get_leaderboard_rank(ctx.guild.id, tag_name)
+            if ranking is None:
+                raise SentinelErrors.TagNotFound(f"`{tag_name}` isn't on the leaderboard")
+        view = TagLeaderboardPaginator(ctx, ranking, total, LEADERBOARD_PAGE_SIZE)
+        if ranking is not None:
+            view.current_page = (ranking.position - 1) // LEADERBOARD_PAGE_SIZE
+        await view.update()
+        embed = await view.embed(view.displayed_values)
+        message = await ctx.send(embed=embed, view=view)
+        view.message = message
+
     @tag.command()
     @commands.guild_only()
     async def info(
@@ -189,12 +256,9 @@ class Tag(SentinelCog, emoji="\N{Label}"):
         if not self._is_valid_tag_name(query):
             raise commands.BadArgument("Query must be a valid tag name")
 
-        guild_tags = await self.bot.tdm.get_tags_in_guild(ctx.guild.id)
-        searched_tags: list[tuple[TagEntry, float]] = []
-        for tag in guild_tags:
-            if (ratio := fuzz(query, tag.tag_name)) > fuzzy_ratio_minmum:
-                searched_tags.append((tag, ratio))
-        searched_tags.sort(key=lambda x: x[1], reverse=True)
+        searched_tags = await self.bot.tdm.search_tags(
+            ctx.guild.id, query, threshold=fuzzy_ratio_minmum, limit=TAG_SEARCH_LIMIT
+        )
         if len(searched_tags) == 0:
             raise SentinelErrors.TagNotFound(
                 f"Cannot any matching tags for query: `{query}`"
@@ -271,6 +335,39 @@ class Tag(SentinelCog, emoji="\N{Label}"):
 
 
 class GuildTagsPaginator(Paginator):
+    """Fetches a guild's tags one page at a time as the user navigates"""
+
+    def __init__(self, ctx: SentinelContext, total: int, page_size: int):
+        super().__init__(ctx, (), page_size)
+        self.total = total
+        self.max_page = max(0, (total - 1) // page_size)
+        self.pages: dict[int, tuple[TagEntry, ...]] = {}
+
+    async def get_page(self, page: int) -> tuple[TagEntry, ...]:
+        if page in self.pages:
+            return self.pages[page]
+        tdm = self.ctx.bot.tdm
+        guild_id = self.ctx.guild.id
+        # the buttons only move one page or jump to an end, so a neighbouring page is usually known
+        if page - 1 in self.pages and self.pages[page - 1]:
+            tags = await tdm.get_tags_in_guild_page(
+                guild_id, self.page_size, after=self.pages[page - 1][-1].tag_name
+            )
+        elif page + 1 in self.pages and self.pages[page + 1]:
+            tags = await tdm.get_tags_in_guild_page(
+                guild_id, self.page_size, before=self.pages[page + 1][0].tag_name
+            )
+        elif page == self.max_page and page != self.min_page:
+            tags = await tdm.get_tags_in_guild_page(
+                guild_id, self.total - page * self.page_size, from_end=True
+            )
+        else:
+            tags = await tdm.get_tags_in_guild_page(
+                guild_id, self.page_size, offset=page * self.page_size
+            )
+        self.pages[page] = tuple(tags)
+        return self.pages[page]
+
     async def embed(self, value_range: tuple[TagEntry]) -> discord.Embed:
         desc = ""
         for i, tag in enumerate(value_range):
@@ -282,6 +379,39 @@ class GuildTagsPaginator(Paginator):
         return embed
 
 
+class TagLeaderboardPaginator(Paginator):
+    """Fetches a guild's tag leaderboard one page at a time as the user navigates"""
+
+    def __init__(self, ctx: SentinelContext, ranking: TagRanking | None, total: int, page_size: int):
+        super().__init__(ctx, (), page_size)
+        self.ranking = ranking
+        self.total = total
+        self.max_page = max(0, (total - 1) // page_size)
+        self.pages: dict[int, tuple[TagRanking, ...]] = {}
+
+    async def get_page(self, page: int) -> tuple[TagRanking, ...]:
+        if page not in self.pages:
+            self.pages[page] = tuple(
+                await self.ctx.bot.tdm.get_leaderboard_page(
+                    self.ctx.guild.id, page * self.page_size, self.page_size
+                )
+            )
+        return self.pages[page]
+
+    async def embed(self, value_range: tuple[TagRanking]) -> discord.Embed:
+        desc = ""
+        for ranking in value_range:
+            line = f"`{ranking.position}:` `{ranking.tag_name}` | `{ranking.uses}` Uses"
+            if self.ranking is not None and ranking.tag_id == self.ranking.tag_id:
+                line = f"**{line}**"
+            desc += line + "\n"
+        embed = self.ctx.embed(
+            title=f"Most Used Tags in `{self.ctx.guild.name}`",
+            description=desc,
+        )
+        return embed
+
+
 class MemberTagsPaginator(Paginator):
     def __init__(
         self,
@@ -1,11 +1,25 @@
 from typing import Optional
+import asyncio
+import logging
 import discord
 from discord.ext import commands
+from discord.ext import tasks
 import time
 
-from ..sentinel import Sentinel, SentinelCog, SentinelContext, SentinelView, SENTINEL_MESSAGE_CACHE_VALUE, SentinelMessageCacheValue
+from ..sentinel import CachePolicy, Sentinel, SentinelCog, SentinelContext, SentinelView, SENTINEL_MESSAGE_CACHE_VALUE, SentinelMessageCacheValue
 from ..command_util import ParamDefaults
-from config import READTHEDOCS_URL, WOLFRAM_API_URL
+from config import (
+    READTHEDOCS_SEARCH_API_URL,
+    READTHEDOCS_URL,
+    RTFM_CACHE_TTL,
+    RTFM_NEGATIVE_TTL,
+    RTFM_RESULT_LIMIT,
+    RTFM_STALE_TTL,
+    WOLFRAM_API_URL,
+    WOLFRAM_CACHE_TTL,
+    WOLFRAM_NEGATIVE_TTL,
+    WOLFRAM_STALE_TTL,
+)
 from env import WOLFRAM_APPID
 from urllib import parse
 import aiohttp
@@ -13,12 +27,52 @@ from bs4 import BeautifulSoup, Tag
 from ..command_util import Paginator
 from ..command_types import RTFMMeta, GuildChannel, VocalGuildChannel
 from ..converters import DiscordObjectAnnotation, DiscordObjectParam
+from ..sphinx_inventory import InventoryError, SphinxIndexes
 from discord.app_commands import describe
+import json
+
+# the short answers API gives a 501 for questions it can't answer, and a 400 for ones it can't read
+WOLFRAM_POLICY = CachePolicy(
+    ttl=WOLFRAM_CACHE_TTL,
+    stale_ttl=WOLFRAM_STALE_TTL,
+    negative_ttl=WOLFRAM_NEGATIVE_TTL,
+    negative_statuses=frozenset({400, 501}),
+)
+RTFM_POLICY = CachePolicy(
+    ttl=RTFM_CACHE_TTL,
+    stale_ttl=RTFM_STALE_TTL,
+    negative_ttl=RTFM_NEGATIVE_TTL,
+    is_negative=lambda body: body == b"[]",
+)
 
 
 class Utility(SentinelCog, emoji="\N{Input Symbol for Numbers}"):
     """Miscellaneous and occassionally useful commands"""
 
+    def __init__(self, bot: Sentinel):
+        super().__init__(bot)
+        self.docs = SphinxIndexes(bot.session)
+
+    async def cog_load(self) -> None:
+        self.refresh_docs.start()
+        await super().cog_load()
+
+    async def cog_unload(self) -> None:
+        self.refresh_docs.cancel()
+        await super().cog_unload()
+
+    @tasks.loop(hours=1)
+    async def refresh_docs(self):
+        # logged rather than raised, since an exception would stop the loop for good
+        try:
+            await self.docs.refresh()
+        except Exception:
+            logging.exception("Failed to refresh the docs indexes, retrying next hour")
+
+    @refresh_docs.before_loop
+    async def before_refresh_docs(self):
+        await self.bot.wait_until_ready()
+
     @commands.hybrid_command()
     async def ping(self, ctx: SentinelContext):
         """Get the latency of the bot."""
@@ -30,7 +84,7 @@ class Utility(SentinelCog, emoji="\N{Input Symbol for Numbers}"):
         await self.bot.apg.fetch("SELECT 1")
         description += f"<:postgreSQL:1061456211897225309> **Database:** {round((time.perf_counter() - start) * 1000, 3)}ms\n"
 
-        await self.bot.session.get("https://google.com")
+        await self.bot.session.get("https://google.com", get_cache=False, set_cache=False)
         description += f"\N{Globe with Meridians} **API:** {round((time.perf_counter() - start) * 1000, 3)}ms\n"
 
         embed = ctx.embed(
@@ -50,8 +104,7 @@ class Utility(SentinelCog, emoji="\N{Input Symbol for Numbers}"):
         url += f"?appid={WOLFRAM_APPID}&i={question}"
 
         try:
-            response = await self.bot.session.get(url)
-            title = (await response.read()).decode("utf-8")
+            title = await self.bot.session.get(url, policy=WOLFRAM_POLICY)
         except aiohttp.ClientResponseError:
             title = "I could not answer that. Please make sure the question is objective, and try again later."
             self.wolfram.reset_cooldown(ctx)
@@ -92,45 +145,90 @@ class Utility(SentinelCog, emoji="\N{Input Symbol for Numbers}"):
         lang="en",
     ):
         """Read the F*%#ing Manual! Searches the documentation for a project on ReadTheDocs"""
-        # TODO: Cacheing?
         if ctx.interaction:
             await ctx.interaction.response.defer()
         project = project.lower().replace(" ", "").replace(".", "")
         ref_url = f"https://{parse.quote_plus(project)}.readthedocs.io/{lang}/{version}"
         search_url = ref_url + "/search.html?q=" + parse.quote_plus(query)
-        data = await self.bot.driver.get(search_url, wait=0.75)
+        try:
+            index = await self.docs.get(parse.quote_plus(project), version or "stable", lang)
+        except (aiohttp.ClientError, asyncio.TimeoutError, InventoryError):
+            index = None  # not built with Sphinx (or unreachable), so fall back to searching
+
+        if index is not None:
+            formatted_results = [
+                RTFMMeta(name=entry.display_name, href=ref_url + "/" + entry.uri, source_description=entry.role)
+                for entry in index.search(query, RTFM_RESULT_LIMIT)
+            ]
+        else:
+            # the parsed results are cached, whether they came from the search API or a rendered search page
+            data = await self.bot.session.memoize(
+                search_url,
+                lambda: self._rtfm_results(project, version, query, ref_url, search_url),
+                policy=RTFM_POLICY,
+            )
+            formatted_results = [RTFMMeta(**result) for result in json.loads(data)]
 
-        soup = BeautifulSoup(data, "html.parser")
+        if not formatted_results:
+            raise Exception("Cannot find any results for your query")
+
+        view = RTFMPaginator(
+            ctx, tuple(formatted_results), 10, project, query, search_url
+        )
+        embed = await view.embed(view.displayed_values)
+        message = await ctx.send(embed=embed, view=view)
+        view.message = message
+        await view.update()
+
+    async def _rtfm_results(
+        self, project: str, version: Optional[str], query: str, ref_url: str, search_url: str
+    ) -> bytes:
+        # the search API has the same results as the search page without rendering it
+        params = {"q": f"project:{project}/{version} {query}"}
+        try:
+            data = await self.bot.session.getjson(
+                READTHEDOCS_SEARCH_API_URL, params=params, get_cache=False, set_cache=False
+            )
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return await self._rtfm_rendered_results(ref_url, search_url)
+
+        results: list[dict[str, str]] = []
+        for page in data["results"]:
+            page_url = page["domain"] + page["path"]
+            sections = [block for block in page.get("blocks", []) if block.get("type") == "section"]
+            if not sections:
+                results.append(dict(name=page["title"], href=page_url, source_description=page["title"]))
+            for section in sections:
+                results.append(
+                    dict(
+                        name=section["title"],
+                        href=f"{page_url}#{section['id']}",
+                        source_description=page["title"],
+                    )
+                )
+        return json.dumps(results).encode()
+
+    async def _rtfm_rendered_results(self, ref_url: str, search_url: str) -> bytes:
         selector = "html > body > div.main-grid > main.grid-item > div#search-results > ul.search > li"
-        results = soup.select(selector)
+        data = await self.bot.driver.get(search_url, selector=selector)
 
-        if not results:
-            raise Exception("Cannot find any results for your query")
+        soup = BeautifulSoup(data, "html.parser")
 
-        formatted_results: list[RTFMMeta] = []
-        for result in results:
+        results: list[dict[str, str]] = []
+        for result in soup.select(selector):
             if (
                 (name := result.select_one("a"))
                 and (href := result.select_one("a"))
                 and (source := result.select_one("span"))
             ):
-                name = name.text
-                source = source.text.strip().strip("()")
-                formatted_results.append(
-                    RTFMMeta(
-                        name=name,
+                results.append(
+                    dict(
+                        name=name.text,
                         href=ref_url + "/" + str(href["href"]),
-                        source_description=source,
+                        source_description=source.text.strip().strip("()"),
                     )
                 )
-
-        view = RTFMPaginator(
-            ctx, tuple(formatted_results), 10, project, query, search_url
-        )
-        embed = await view.embed(view.displayed_values)
-        message = await ctx.send(embed=embed, view=view)
-        view.message = message
-        await view.update()
+        return json.dumps(results).encode()
 
     @commands.hybrid_command()
     @describe(
@@ -200,18 +298,28 @@ class Utility(SentinelCog, emoji="\N{Input Symbol for Numbers}"):
     @commands.hybrid_command()
     async def snipe(self, ctx: SentinelContext):
         """Gets the most recent edited and deleted messages in a channel"""
-        items = self.bot.deleted_message_cache[(ctx.guild.id, ctx.channel.id)]
+        key = (ctx.guild.id, ctx.channel.id)
+        if self.bot.snipe_store is not None:
+            # the store has every process' snipes, including ones from before a restart
+            await self.bot.snipe_store.flush()
+            total = await self.bot.snipe_store.count(key)
+            if total:
+                view = StoredSnipePaginator(ctx, total)
+                await view.update()
+                embed = await view.embed(view.displayed_values)
+                view.message = await ctx.send(embed=embed, view=view)
+                return
+
+        items = self.bot.deleted_message_cache[key]
         if not items:
             embed = ctx.embed(
                 title="No Snipes Found",
                 description="There are no snipes for this channel. Snipes are only recorded while the bot is online",
             )
             return await ctx.send(embed=embed)
-        
-        items_list = list(items)
-        items_list.sort(key=lambda item: item[4], reverse=True)
 
-        view = SnipePaginator(ctx, tuple(items_list))
+        # the cache is in insertion order, so the most recent snipe is last
+        view = SnipePaginator(ctx, tuple(reversed(items)))
         await view.update()
         embed = await view.embed(view.displayed_values)
         message = await ctx.send(embed=embed, view=view)
@@ -322,5 +430,30 @@ class SnipePaginator(Paginator):
             
 
 
+class StoredSnipePaginator(SnipePaginator):
+    """Reads a channel's snipes from the snipe store one page at a time as the user navigates"""
+
+    def __init__(self, ctx: SentinelContext, total: int):
+        super().__init__(ctx, ())
+        self.key = (ctx.guild.id, ctx.channel.id)
+        self.max_page = max(0, total - 1)
+        self.pages: dict[int, list[tuple[str, SENTINEL_MESSAGE_CACHE_VALUE]]] = {}
+
+    async def get_page(self, page: int) -> tuple[SENTINEL_MESSAGE_CACHE_VALUE, ...]:
+        if page not in self.pages:
+            store = self.ctx.bot.snipe_store
+            # the buttons only move one page or jump to an end, so a neighbouring page is usually known
+            if self.pages.get(page - 1):
+                entries = await store.page(self.key, 1, before=self.pages[page - 1][-1][0])
+            elif self.pages.get(page + 1):
+                entries = await store.page(self.key, 1, after=self.pages[page + 1][0][0])
+            elif page == self.max_page and page != self.min_page:
+                entries = await store.page(self.key, 1, oldest=True)
+            else:
+                entries = (await store.page(self.key, page + 1))[page:]
+            self.pages[page] = entries
+        return tuple(value for _, value in self.pages[page])
+
+
 async def setup(bot: Sentinel):
     await bot.add_cog(Utility(bot))
@@ -1,4 +1,3 @@
-import asyncio
 import re
 import discord
 from discord.ext import commands
@@ -7,9 +6,10 @@ from discord.ext import commands
 from discord.app_commands import describe
 from typing import Optional
 
-from ..sentinel import Sentinel, SentinelCog, SentinelContext, SentinelView
+from ..sentinel import PageSource, Sentinel, SentinelCog, SentinelContext, SentinelView
 from ..command_util import Paginator, lim
 from ..converters import URL, URLParam, Range
+from ..command_types import WebSearchResult
 from urllib import parse
 import bs4
 from selenium.webdriver.firefox.firefox_profile import FirefoxProfile
@@ -29,19 +29,31 @@ class Web(SentinelCog, emoji="\N{Globe with Meridians}"):
     @web.command()
     async def search(self, ctx: SentinelContext, *, query: str):
         """Searches duckduckgo.com for a query and returns a list of results"""
+        safe_search = "1"
+        if query.startswith("nsfw:"):
+            query = query.removeprefix("nsfw:").strip()
+            safe_search = "-2"
         parsed = parse.quote_plus(query)
-        if parsed.startswith("nsfw:"):
-            parsed = parsed.lstrip("nsfw:") + "+!safeoff"
-        else:
-            parsed = parsed + "+!safeon"
-        search_base = f"https://duckduckgo.com/?q={parsed}&atb=v361-3&ia=web"
-        page_content = await self.bot.driver.get(search_base)
-
-        soup = bs4.BeautifulSoup(page_content, "html.parser")
-        selector = "div#links.results.js-results > div.nrn-react-div > article"
-        results = soup.select(selector)
-
-        view = WebGetPaginator(ctx, parsed, tuple(results))
+        # the html endpoint serves the same results without any JS, so the full site is only a fallback
+        source, soup = await self.bot.scrape(
+            PageSource(
+                url=f"https://html.duckduckgo.com/html/?q={parsed}&kp={safe_search}",
+                selector=HTML_RESULT_SELECTOR,
+            ),
+            PageSource(
+                url=f"https://duckduckgo.com/?q={parsed}&kp={safe_search}&atb=v361-3&ia=web",
+                selector=JS_RESULT_SELECTOR,
+                needs_js=True,
+            ),
+        )
+        parse_result = parse_js_result if source.needs_js else parse_html_result
+        results = [
+            result
+            for tag in soup.select(source.selector)
+            if (result := parse_result(tag)) is not None
+        ]
+
+        view = WebGetPaginator(ctx, query, tuple(results))
         await view.update()
         embed = await view.embed(view.displayed_values)
         message = await ctx.send(embed=embed, view=view)
@@ -52,10 +64,10 @@ class Web(SentinelCog, emoji="\N{Globe with Meridians}"):
         """Searches duckduckgo.com for a query and returns a list of images"""
         parsed = parse.quote_plus(query)
         search_base = f"https://duckduckgo.com/?t=ffab&q={parsed}&iar=images&iax=images&ia=images&kp=-2"
-        page_content = await self.bot.driver.get(search_base, wait=1.5)
+        selector = "div > div.tile-wrap > div > div.tile"
+        page_content = await self.bot.driver.get(search_base, selector=selector)
 
         soup = bs4.BeautifulSoup(page_content, "html.parser")
-        selector = "div > div.tile-wrap > div > div.tile"
         results = soup.select(selector)
 
         view = WebImagePaginator(ctx, query, tuple(results[:-1]))
@@ -66,14 +78,13 @@ class Web(SentinelCog, emoji="\N{Globe with Meridians}"):
 
     @web.command()
     async def ss(self, ctx: SentinelContext, url = URL, wait = Range(float, 0, 5, default=1)):
-        """Gets a screenshot of a website"""
+        """Gets a screenshot of a website once it has loaded, waiting up to `wait` more seconds for it to settle"""
         embed = ctx.embed(
             title=f"Getting {url.netloc}...",
             description="Depending on the content size and server load, this may take a while",
         )
         message = await ctx.send(embed=embed)
-        await asyncio.sleep(wait)
-        content = await self.bot.driver.screenshot(url.geturl())
+        content = await self.bot.driver.screenshot(url.geturl(), timeout=wait)
         embed = ctx.embed(title=url.netloc)
         embed.url = url.geturl()
         filename = f"{ctx.author.id}.png"
@@ -83,40 +94,54 @@ class Web(SentinelCog, emoji="\N{Globe with Meridians}"):
         await message.edit(embed=embed, attachments=[file])
 
 
+HTML_RESULT_SELECTOR = "div.result.web-result"
+JS_RESULT_SELECTOR = "div#links.results.js-results > div.nrn-react-div > article"
+
+
+def parse_html_result(result: bs4.element.Tag) -> Optional[WebSearchResult]:
+    link = result.select_one("a.result__a")
+    description = result.select_one("a.result__snippet")
+    if link is None or description is None:
+        return None
+    # links go through a redirect which carries the real URL in `uddg`
+    href = str(link["href"])
+    target = parse.parse_qs(parse.urlparse(href).query).get("uddg")
+    return WebSearchResult(
+        title=link.text.strip(),
+        url=target[0] if target else href,
+        description=description.text.strip(),
+    )
+
+
+def parse_js_result(result: bs4.element.Tag) -> Optional[WebSearchResult]:
+    url = result.select_one("div > a > span")
+    title = result.select_one("div > h2 > a > span")
+    description = result.select_one(
+        "div.E2eLOJr8HctVnDOTM8fs > div > span"
+    )  # may or may not break in the near future
+    if url is None or title is None or description is None:
+        return None
+    url = url.text
+    if not url.startswith("https://"):
+        url = "https://" + url
+    return WebSearchResult(title=title.text, url=url, description=description.text)
+
+
 class WebGetPaginator(Paginator):
     def __init__(
-        self, ctx: SentinelContext, query: str, results: tuple[bs4.element.Tag]
+        self, ctx: SentinelContext, query: str, results: tuple[WebSearchResult, ...]
     ):
         self.query = query
         self.results = results
         super().__init__(ctx, results, page_size=10)
 
-    async def embed(self, displayed_values: tuple[bs4.element.Tag]) -> discord.Embed:
+    async def embed(self, displayed_values: tuple[WebSearchResult, ...]) -> discord.Embed:
         title = f"Web Seach: `{self.query}` - Page `{self.current_page+1}`/`{self.max_page+1}`"
         embed = self.ctx.embed(title=title)
         for result in displayed_values:
-            url = result.select_one("div > a > span")
-            if url is None:
-                continue
-            url = url.text
-            if not url.startswith("https://"):
-                url = "https://" + url
-
-            title = result.select_one("div > h2 > a > span")
-            if title is None:
-                continue
-            title = title.text
-
-            description = result.select_one(
-                "div.E2eLOJr8HctVnDOTM8fs > div > span"
-            )  # may or may not break in the near future
-            if description is None:
-                continue
-            description = description.text
-
             embed.add_field(
-                name=title,
-                value=f'[{lim(description, 75)}]({url} "Go to {url}")',
+                name=result.title,
+                value=f'[{lim(result.description, 75)}]({result.url} "Go to {result.url}")',
                 inline=False,
             )
         return embed
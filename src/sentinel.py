@@ -1,12 +1,22 @@
+from bs4 import BeautifulSoup
 from dataclasses import dataclass
 from redis import asyncio as aioredis
+from redis.exceptions import RedisError
 
+from collections import OrderedDict, deque
 import asyncio
+import contextlib
+import hashlib
 import io
 import json
 import logging
+import math
+import time
 from typing import (
     Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
     Coroutine,
     Generator,
     Generic,
@@ -14,6 +24,7 @@ from typing import (
     Mapping,
     Optional,
     ParamSpec,
+    Sequence,
     Type,
     TypeGuard,
     TypeVar,
@@ -29,15 +40,44 @@ import openai
 
 import os
 import env
+from config import (
+    BROWSER_CHECKOUT_TIMEOUT,
+    BROWSER_HEALTH_CHECK_INTERVAL,
+    BROWSER_NETWORK_IDLE_TIME,
+    BROWSER_POOL_SIZE,
+    BROWSER_QUEUE_LIMIT,
+    BROWSER_READY_POLL_INTERVAL,
+    BROWSER_READY_TIMEOUT,
+    BROWSER_WORKER_MAX_PAGES,
+    DEFAULT_PREFIX,
+    HTTP_CACHE_STALE_RETENTION,
+    HTTP_CACHE_TTL,
+    HTTP_MEMORY_CACHE_SIZE,
+    SCREENSHOT_CACHE_TTL,
+    SCREENSHOT_MEMORY_CACHE_BYTES,
+    SCREENSHOT_REDIS_MAX_BYTES,
+    SCREENSHOT_VIEWPORT,
+    SNIPE_CACHE_BYTES,
+    SNIPE_STORE_BATCH_SIZE,
+    SNIPE_STORE_ENABLED,
+    SNIPE_STORE_MAXLEN,
+    SNIPE_STORE_RETENTION,
+)
 from glob import glob
 import importlib
 import aiohttp
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver import Firefox as SeleniumFirefox
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions
+from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.firefox.options import Options as FirefoxOptions
 from selenium.webdriver.firefox.firefox_profile import FirefoxProfile
 
 from . import error_types as SentinelErrors
-from .db_managers import UserDataManager, GuildDataManager, TagDataManager, GuildConfigManager, UserConfigManager
+from .caches import LRUCache, SingleFlight
+from .db_managers import CoinLedger, UserDataManager, GuildDataManager, TagDataManager, GuildConfigManager, UserConfigManager, BlacklistManager
 
 _KT = TypeVar("_KT")
 _VT = TypeVar("_VT")
@@ -56,9 +96,12 @@ class Sentinel(commands.Bot):
         self.apg: asyncpg.Pool
         self.driver: SentinelDriver
 
+        self.ledger: CoinLedger
         self.udm: UserDataManager
         self.gdm: GuildDataManager
         self.tdm: TagDataManager
+        self.blm: BlacklistManager
+        self.snipe_store: Optional[SnipeStore] = None
 
         self.deleted_message_cache = SentinelMessageCache()
 
@@ -92,15 +135,23 @@ class Sentinel(commands.Bot):
         logging.info("Sentinel v" + ".".join(__version__) + " Online")
         await self.connect_db()
         await self.connect_session()
+        if SNIPE_STORE_ENABLED:
+            self.snipe_store = SnipeStore(self.session.cache)
         await self.prepare_databases()
         await self.connect_driver()
         await self.reload_extensions()
 
-        self.udm = UserDataManager(self.apg)
+        self.ledger = CoinLedger(self.apg)
+        await self.ledger.ensure_partitions()
+        await self.ledger.seed_snapshots()
+        self.udm = UserDataManager(self.apg, self.ledger)
         self.gdm = GuildDataManager(self.apg)
-        self.tdm = TagDataManager(self.apg)
+        self.tdm = TagDataManager(self.apg, self.ledger)
         self.gcm = GuildConfigManager(self.apg)
         self.ucm = UserConfigManager(self.apg)
+        await self.gcm.load_prefixes()
+        self.blm = BlacklistManager(self.apg)
+        await self.blm.load()
 
     async def reload_extensions(
             self, ext_dir: str = ".\\src\\ext"
@@ -144,16 +195,68 @@ class Sentinel(commands.Bot):
         await self.session._build_cache()
 
     async def on_message(self, message: discord.Message, /) -> None:
-        if message.author.id in await self.apg.fetch("SELECT user_id FROM blacklist"):
+        if self.blm.is_blacklisted(message.author.id):
             return
 
         return await super().on_message(message)
 
+    async def close(self) -> None:
+        # one failed step shouldn't keep the others, or the rest of the shutdown, from running. anything
+        # setup_hook didn't get to (if it failed part way) is skipped
+        steps: list[Callable[[], Awaitable[None]]] = []
+        tdm: Optional[TagDataManager] = getattr(self, "tdm", None)
+        if tdm is not None:
+            steps.append(tdm.flush_tag_uses)
+        ledger: Optional[CoinLedger] = getattr(self, "ledger", None)
+        if ledger is not None:
+            steps.append(ledger.flush)
+        if self.snipe_store is not None:
+            steps.append(self.snipe_store.flush)
+        blm: Optional[BlacklistManager] = getattr(self, "blm", None)
+        if blm is not None:
+            steps.append(blm.close)
+        driver: Optional[SentinelDriver] = getattr(self, "driver", None)
+        if driver is not None:
+            steps.append(driver.close)
+        for step in steps:
+            try:
+                await step()
+            except Exception:
+                logging.exception(f"{step.__qualname__} failed on close")
+        await super().close()
+
     async def prepare_databases(self):
         await self.apg.execute(open("schema.sql", "r").read())
 
     async def connect_driver(self):
-        self.driver = SentinelDriver()
+        self.driver = SentinelDriver(cache=self.session.cache)
+
+    async def scrape(
+        self, *sources: "PageSource", policy: Optional["CachePolicy"] = None
+    ) -> tuple["PageSource", BeautifulSoup]:
+        """
+        Tries each source in order, returning the first one whose selector matches along with its soup.
+        Sources that don't need JS are plain (cached) GETs, so the browser pool is only used as a fallback.
+        """
+        if not sources:
+            raise ValueError("No sources to scrape")
+        for source in sources:
+            try:
+                if source.needs_js:
+                    html = await self.driver.get(source.url, selector=source.selector)
+                else:
+                    html = await self.session.get(source.url, policy=policy)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # a missing page is an answer, not a sign that the page needed rendering
+                missing = isinstance(e, aiohttp.ClientResponseError) and e.status in (404, 410)
+                if missing or source is sources[-1]:
+                    raise
+                logging.info(f"Falling back from {source.url}: {e}")
+                continue
+            soup = BeautifulSoup(html, "html.parser")
+            if soup.select_one(source.selector) is not None:
+                return source, soup
+        return source, soup  # nothing matched, so callers get the last attempt and find no results in it
 
     @property
     def commands(self) -> set["TypedHybrid"]:
@@ -219,9 +322,7 @@ class SentinelTree(discord.app_commands.CommandTree):
         if itx.type == discord.InteractionType.application_command:
             # TODO: automatically defer?
             pass
-        return itx.user.id not in await self.bot.apg.fetch(
-            "SELECT user_id FROM blacklist"
-        )
+        return not self.bot.blm.is_blacklisted(itx.user.id)
 
 
 class SentinelView(discord.ui.View):
@@ -322,7 +423,89 @@ class SentinelCog(commands.Cog):
         return super().walk_commands()  # type: ignore
 
 
+@dataclass
+class CachedResponse:
+    body: bytes
+    expires_at: float  # unix time after which the body has to be revalidated
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    status: int = 200  # an error status marks a negatively cached lookup, with an empty body
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    @property
+    def revalidatable(self) -> bool:
+        return self.etag is not None or self.last_modified is not None
+
+    def servable_stale(self, stale_ttl: float) -> bool:
+        return self.status < 400 and time.time() < self.expires_at + stale_ttl
+
+    def result(self) -> bytes:
+        if self.status >= 400:
+            raise CachedResponseError(self.status)
+        return self.body
+
+    def dump(self) -> dict[str, bytes | str | float]:
+        data: dict[str, bytes | str | float] = {"body": self.body, "expires_at": self.expires_at, "status": self.status}
+        if self.etag is not None:
+            data["etag"] = self.etag
+        if self.last_modified is not None:
+            data["last_modified"] = self.last_modified
+        return data
+
+    @classmethod
+    def load(cls, data: dict[bytes, bytes]) -> "CachedResponse":
+        etag = data.get(b"etag")
+        last_modified = data.get(b"last_modified")
+        return cls(
+            body=data[b"body"],
+            expires_at=float(data[b"expires_at"]),
+            etag=etag.decode() if etag is not None else None,
+            last_modified=last_modified.decode() if last_modified is not None else None,
+            status=int(data.get(b"status", 200)),
+        )
+
+
+class CachedResponseError(aiohttp.ClientResponseError):
+    """Raised in place of a request while an earlier failure for it is still negatively cached"""
+
+    def __init__(self, status: int):
+        super().__init__(None, (), status=status, message="negatively cached")  # type: ignore
+
+    def __str__(self) -> str:
+        return f"{self.status}, message={self.message!r}"
+
+
+@dataclass(frozen=True, kw_only=True)
+class CachePolicy:
+    """Freshness rules for a single upstream endpoint"""
+
+    ttl: Optional[float] = None  # None defers to the upstream Cache-Control
+    stale_ttl: float = 0  # how long past `ttl` a stale body is served while it's refreshed in the background
+    negative_ttl: float = 0  # how long failed lookups are remembered, 0 to never remember them
+    negative_statuses: frozenset[int] = frozenset({404})
+    is_negative: Optional[Callable[[bytes], bool]] = None  # for APIs which report misses in a 200 body
+
+
+@dataclass(frozen=True, kw_only=True)
+class PageSource:
+    """One way of getting a scraped page: its URL, the selector for the content wanted, and whether it needs JS"""
+
+    url: str
+    selector: str
+    needs_js: bool = False
+
+
 class SentinelAIOSession(aiohttp.ClientSession):
+    """
+    An aiohttp session whose GETs go through an in-process LRU (L1) in front of Redis (L2).
+    Keys cover the method, URL and sorted params. Freshness comes from a `CachePolicy` (or the `ttl`
+    argument, or the upstream Cache-Control). Stale responses are either served while they are refreshed
+    in the background, or revalidated conditionally when they have an ETag/Last-Modified.
+    """
+
     def __init__(self):
         super().__init__(
             raise_for_status=True,
@@ -331,42 +514,204 @@ class SentinelAIOSession(aiohttp.ClientSession):
             },
         )
         self.cache: aioredis.Redis
+        self.memory_cache: LRUCache[str, CachedResponse] = LRUCache(HTTP_MEMORY_CACHE_SIZE)
+        self.inflight: SingleFlight[str, bytes] = SingleFlight()
+        self.refreshing: set[asyncio.Future[bytes]] = set()
 
     async def _build_cache(self):
-        self.cache = await aioredis.from_url("redis://localhost", decode_responses=True)
-
-    async def get(self, url: str, /, **kwargs) -> str:
-        get_cache = kwargs.pop("get_cache", True)
-        set_cache = kwargs.pop("set_cache", True)
-
-        if get_cache:
-            cached = await self.cache.get(url)
-            if cached is not None and set_cache:
-                return await self.get(url, get_cache=False, set_cache=True, **kwargs)
+        self.cache = await aioredis.from_url("redis://localhost")
+
+    async def getbytes(
+        self,
+        url: str,
+        /,
+        *,
+        params: Optional[Mapping[str, Any]] = None,
+        ttl: Optional[float] = None,
+        policy: Optional[CachePolicy] = None,
+        get_cache: bool = True,
+        set_cache: bool = True,
+        **kwargs,
+    ) -> bytes:
+        policy = policy or CachePolicy(ttl=ttl)
+        key = self.cache_key("GET", url, params)
+        cached = await self._cache_get(key) if get_cache else None
+        return await self._serve(
+            key, cached, policy, lambda: self._fetch(key, url, cached, params, policy, set_cache, kwargs)
+        )
 
-        response = await (await super().get(url, **kwargs)).read()
+    async def memoize(self, key: str, factory: Callable[[], Awaitable[bytes]], /, *, policy: CachePolicy) -> bytes:
+        """Caches the output of something which isn't a plain GET (e.g. a rendered page) like a response"""
+        key = "memo:" + hashlib.sha256(key.encode()).hexdigest()
+        cached = await self._cache_get(key)
+
+        async def fetch() -> bytes:
+            body = await factory()
+            await self._cache_set(key, body, policy)
+            return body
+
+        return await self._serve(key, cached, policy, fetch)
+
+    async def _serve(
+        self,
+        key: str,
+        cached: Optional[CachedResponse],
+        policy: CachePolicy,
+        fetch: Callable[[], Awaitable[bytes]],
+    ) -> bytes:
+        if cached is not None:
+            if cached.fresh:
+                return cached.result()
+            if cached.servable_stale(policy.stale_ttl):
+                self._refresh(key, fetch)
+                return cached.body
+        # concurrent misses for the same key wait on a single request
+        return await self.inflight.do(key, fetch)
+
+    def _refresh(self, key: str, fetch: Callable[[], Awaitable[bytes]]) -> None:
+        if key in self.inflight:
+            return
+        future = asyncio.ensure_future(self.inflight.do(key, fetch))
+        self.refreshing.add(future)  # keeps a reference until it's done
+        future.add_done_callback(self._refreshed)
+
+    def _refreshed(self, future: asyncio.Future[bytes]) -> None:
+        self.refreshing.discard(future)
+        if not future.cancelled() and (e := future.exception()) is not None:
+            logging.warning(f"Background cache refresh failed: {e}")
+
+    async def _fetch(
+        self,
+        key: str,
+        url: str,
+        cached: Optional[CachedResponse],
+        params: Optional[Mapping[str, Any]],
+        policy: CachePolicy,
+        set_cache: bool,
+        kwargs: dict[str, Any],
+    ) -> bytes:
+        headers = dict(kwargs.pop("headers", None) or {})
+        if cached is not None and cached.status < 400:
+            if cached.etag is not None:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified is not None:
+                headers["If-Modified-Since"] = cached.last_modified
 
-        if set_cache:
-            await self.cache.set(url, response)
-            await self.cache.expire(url, int(datetime.now().timestamp() + 60 * 60))
+        try:
+            async with super().get(url, params=params, headers=headers, **kwargs) as response:
+                if response.status == 304 and cached is not None:
+                    body = cached.body
+                else:
+                    body = await response.read()
+                if set_cache:
+                    await self._cache_set(key, body, policy, response.headers)
+        except aiohttp.ClientResponseError as e:
+            if set_cache and policy.negative_ttl > 0 and e.status in policy.negative_statuses:
+                failed = CachedResponse(body=b"", expires_at=time.time() + policy.negative_ttl, status=e.status)
+                await self._cache_store(key, failed, policy.negative_ttl)
+            raise
+        return body
 
-        return response.decode()
+    async def get(self, url: str, /, **kwargs) -> str:
+        return (await self.getbytes(url, **kwargs)).decode()
 
     async def getjson(self, url: str, /, **kwargs) -> dict[str, Any]:
-
+        route = kwargs.pop("route", [])
         response = await self.get(url, **kwargs)
         js: dict[str, Any] = json.loads(response)
 
-        for key in kwargs.pop("route", []):
+        for key in route:
             js = js[key]
 
         return js
 
+    @staticmethod
+    def cache_key(method: str, url: str, params: Optional[Mapping[str, Any]] = None) -> str:
+        canonical = f"{method.upper()} {url}"
+        if params:
+            canonical += "?" + urlencode(sorted((str(k), str(v)) for k, v in params.items()))
+        # hashed, so API keys in the params never end up in Redis key names
+        return "http:" + hashlib.sha256(canonical.encode()).hexdigest()
+
+    async def _cache_get(self, key: str) -> Optional[CachedResponse]:
+        cached = self.memory_cache.get(key)
+        if cached is not None:
+            return cached
+        try:
+            data = await self.cache.hgetall(key)
+        except RedisError as e:
+            logging.warning(f"HTTP cache read failed: {e}")
+            return None
+        if not data:
+            return None
+        cached = CachedResponse.load(data)
+        self.memory_cache[key] = cached
+        return cached
+
+    async def _cache_set(
+        self, key: str, body: bytes, policy: CachePolicy, headers: Optional[Mapping[str, str]] = None
+    ) -> None:
+        headers = headers or {}
+        cache_control = {
+            directive.strip().lower().partition("=")[0]: directive.strip().partition("=")[2]
+            for directive in headers.get("Cache-Control", "").split(",")
+            if directive.strip()
+        }
+        if "no-store" in cache_control:
+            return
+        ttl = policy.ttl
+        if ttl is None:
+            if "no-cache" in cache_control:
+                ttl = 0
+            elif cache_control.get("max-age", "").isdigit():
+                ttl = int(cache_control["max-age"])
+            else:
+                ttl = HTTP_CACHE_TTL
+        cached = CachedResponse(
+            body=body,
+            expires_at=time.time(),
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+        )
+        if policy.negative_ttl > 0 and policy.is_negative is not None and policy.is_negative(body):
+            # a miss reported as a success, which shouldn't outlive the negative window or be served stale
+            ttl = min(ttl, policy.negative_ttl)
+            retention = ttl
+        else:
+            # stale entries are only worth keeping if they can be served or revalidated
+            retention = ttl + max(policy.stale_ttl, HTTP_CACHE_STALE_RETENTION if cached.revalidatable else 0)
+        cached.expires_at += ttl
+        await self._cache_store(key, cached, retention)
+
+    async def _cache_store(self, key: str, cached: CachedResponse, retention: float) -> None:
+        if retention <= 0:
+            return
+        self.memory_cache.set(key, cached, ttl=retention)
+        try:
+            async with self.cache.pipeline(transaction=True) as pipe:
+                pipe.delete(key)
+                pipe.hset(key, mapping=cached.dump())  # type: ignore
+                pipe.expire(key, int(math.ceil(retention)))
+                await pipe.execute()
+        except RedisError as e:
+            logging.warning(f"HTTP cache write failed: {e}")
+
+
+# true once the page has loaded and no resource has finished loading for `arguments[0]` milliseconds
+NETWORK_IDLE_SCRIPT = """
+if (document.readyState !== "complete") return false;
+const finished = performance.getEntriesByType("resource").map((entry) => entry.responseEnd);
+return performance.now() - Math.max(0, ...finished) >= arguments[0];
+"""
+
+
+class BrowserWorker:
+    """A single headless Firefox, owned by whichever render has it checked out of the `SentinelDriver` pool"""
 
-class SentinelDriver:
     def __init__(self):
         options = FirefoxOptions()
         options.headless = True
+        options.page_load_strategy = "eager"  # readiness is decided by `render`, not by the load event
         options.binary_location = "C:\\Program Files\\Mozilla Firefox\\firefox.exe"
         self.driver = SeleniumFirefox(
             options=options,
@@ -375,66 +720,428 @@ class SentinelDriver:
         )
         profile: FirefoxProfile = self.driver.firefox_profile  # type: ignore
         profile.add_extension("services/modify_headers_extension.xpi")
+        self.pages = 0
+        self.broken = False
+        self.last_used = time.monotonic()
+        self.viewport: Optional[tuple[int, int]] = None
+
+    def render(self, url: str, selector: Optional[str], timeout: float) -> bool:
+        """
+        Navigates to `url` and blocks until `selector` matches. Without one, it blocks until the page has
+        loaded (for up to `BROWSER_READY_TIMEOUT`, however short `timeout` is), then until the network is idle.
+        Returns whether the page got there before timing out
+        """
+        self.driver.get(url)
+        try:
+            if selector is not None:
+                WebDriverWait(self.driver, timeout, poll_frequency=BROWSER_READY_POLL_INTERVAL).until(
+                    expected_conditions.presence_of_element_located((By.CSS_SELECTOR, selector))
+                )
+            else:
+                # the eager load strategy returns at DOMContentLoaded, so this is the floor the load event used to be
+                WebDriverWait(
+                    self.driver, max(timeout, BROWSER_READY_TIMEOUT), poll_frequency=BROWSER_READY_POLL_INTERVAL
+                ).until(lambda driver: driver.execute_script("return document.readyState") == "complete")
+                WebDriverWait(self.driver, timeout, poll_frequency=BROWSER_READY_POLL_INTERVAL).until(
+                    lambda driver: driver.execute_script(NETWORK_IDLE_SCRIPT, BROWSER_NETWORK_IDLE_TIME * 1000)
+                )
+        except TimeoutException:
+            return False  # whatever did load is still usable, and callers already deal with missing results
+        return True
 
-    async def get(self, url: str, /, wait: float = 0) -> str:
-        thread_get = asyncio.to_thread(self.driver.get, url)
-        await thread_get
-        thread_get.close()
-        await asyncio.sleep(wait)
-        thread_return: Coroutine[Any, Any, str] = asyncio.to_thread(
-            self.driver.execute_script, "return document.documentElement.outerHTML"
-        )
-        return await thread_return
-
-    async def screenshot(self, url: str, /, wait: float = 0) -> io.BytesIO:
-        thread_get = asyncio.to_thread(self.driver.get, url)
-        await thread_get
-        thread_get.close()
-        await asyncio.sleep(wait)
-        thread_return: Coroutine[Any, Any, bytes] = asyncio.to_thread(
-            self.driver.get_screenshot_as_png
-        )
-        b = await thread_return
-        buf = io.BytesIO(b)
+    def resize(self, viewport: tuple[int, int]) -> None:
+        if self.viewport != viewport:
+            self.driver.set_window_size(*viewport)
+            self.viewport = viewport
+
+    def healthy(self) -> bool:
+        try:
+            self.driver.current_url  # a round trip to geckodriver, which fails once the browser is gone
+        except WebDriverException:
+            return False
+        return True
+
+    def quit(self) -> None:
+        try:
+            self.driver.quit()
+        except WebDriverException:
+            pass
+
+
+class ScreenshotCache:
+    """
+    Rendered screenshots keyed by their normalized URL and viewport. Kept in a byte-bounded LRU,
+    in front of Redis for the ones small enough to be worth sharing, and both expire after `ttl`.
+    """
+
+    def __init__(
+        self,
+        redis: Optional[aioredis.Redis] = None,
+        *,
+        maxbytes: int = SCREENSHOT_MEMORY_CACHE_BYTES,
+        ttl: float = SCREENSHOT_CACHE_TTL,
+    ):
+        self.redis = redis
+        self.ttl = ttl
+        self.memory: LRUCache[str, bytes] = LRUCache(maxbytes, ttl=ttl, weigher=len)
+
+    @staticmethod
+    def normalize_url(url: str) -> str:
+        """Collapses the ways of writing the same URL: case, default ports, query order and fragments"""
+        parts = urlsplit(url.strip())
+        scheme = (parts.scheme or "https").lower()
+        host = (parts.hostname or "").lower()
+        if ":" in host:
+            host = f"[{host}]"  # IPv6
+        port = parts.port
+        netloc = host if port is None or (scheme, port) in (("http", 80), ("https", 443)) else f"{host}:{port}"
+        query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+        return urlunsplit((scheme, netloc, parts.path or "/", query, ""))
+
+    def key(self, url: str, viewport: tuple[int, int]) -> str:
+        canonical = f"{self.normalize_url(url)} {viewport[0]}x{viewport[1]}"
+        return "screenshot:" + hashlib.sha256(canonical.encode()).hexdigest()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        png = self.memory.get(key)
+        if png is not None or self.redis is None:
+            return png
+        try:
+            png = await self.redis.get(key)
+        except RedisError as e:
+            logging.warning(f"Screenshot cache read failed: {e}")
+            return None
+        if png is not None:
+            self.memory[key] = png
+        return png
+
+    async def set(self, key: str, png: bytes) -> None:
+        self.memory[key] = png
+        if self.redis is None or len(png) > SCREENSHOT_REDIS_MAX_BYTES:
+            return
+        try:
+            await self.redis.set(key, png, ex=int(math.ceil(self.ttl)))
+        except RedisError as e:
+            logging.warning(f"Screenshot cache write failed: {e}")
+
+
+class SentinelDriver:
+    """
+    A bounded pool of headless browsers. Renders check a worker out, and wait in line (up to `max_waiting`
+    of them) when every worker is busy. Workers are replaced after `max_pages` renders, after a crash,
+    or when they fail a health check.
+    """
+
+    def __init__(
+        self,
+        size: int = BROWSER_POOL_SIZE,
+        *,
+        max_pages: int = BROWSER_WORKER_MAX_PAGES,
+        max_waiting: int = BROWSER_QUEUE_LIMIT,
+        cache: Optional[aioredis.Redis] = None,
+    ):
+        self.size = size
+        self.max_pages = max_pages
+        self.max_waiting = max_waiting
+        self.idle: asyncio.Queue[BrowserWorker] = asyncio.Queue()
+        self.workers: set[BrowserWorker] = set()
+        self.spawning = 0
+        self.waiting = 0
+        self.inflight: SingleFlight[tuple[str, str, Optional[str], float], Any] = SingleFlight()
+        self.screenshots = ScreenshotCache(cache)
+
+    @contextlib.asynccontextmanager
+    async def checkout(self) -> AsyncIterator[BrowserWorker]:
+        worker = await self._acquire()
+        try:
+            yield worker
+        except WebDriverException:
+            worker.broken = True
+            raise
+        finally:
+            await self._release(worker)
+
+    async def _acquire(self) -> BrowserWorker:
+        while True:
+            try:
+                worker = self.idle.get_nowait()
+            except asyncio.QueueEmpty:
+                if len(self.workers) + self.spawning < self.size:
+                    return await self._spawn()
+                if self.waiting >= self.max_waiting:
+                    raise SentinelErrors.BrowserPoolBusy("Too many pages are being rendered, try again shortly")
+                self.waiting += 1
+                try:
+                    worker = await asyncio.wait_for(self.idle.get(), BROWSER_CHECKOUT_TIMEOUT)
+                except asyncio.TimeoutError:
+                    raise SentinelErrors.BrowserPoolBusy("Timed out waiting for a browser, try again shortly")
+                finally:
+                    self.waiting -= 1
+
+            if time.monotonic() - worker.last_used < BROWSER_HEALTH_CHECK_INTERVAL:
+                return worker
+            if await asyncio.to_thread(worker.healthy):
+                return worker
+            await self._retire(worker)
+
+    async def _spawn(self) -> BrowserWorker:
+        self.spawning += 1
+        try:
+            worker = await asyncio.to_thread(BrowserWorker)
+        finally:
+            self.spawning -= 1
+        self.workers.add(worker)
+        return worker
+
+    async def _release(self, worker: BrowserWorker) -> None:
+        worker.pages += 1
+        worker.last_used = time.monotonic()
+        if not worker.broken and worker.pages < self.max_pages:
+            self.idle.put_nowait(worker)
+            return
+
+        await self._retire(worker)
+        if self.waiting:
+            # someone is queued for the slot this worker held, so replace it now rather than on the next checkout
+            try:
+                self.idle.put_nowait(await self._spawn())
+            except (WebDriverException, OSError) as e:
+                logging.warning(f"Could not replace a browser worker: {e}")
+
+    async def _retire(self, worker: BrowserWorker) -> None:
+        self.workers.discard(worker)
+        await asyncio.to_thread(worker.quit)
+
+    async def close(self) -> None:
+        workers, self.workers = self.workers, set()
+        await asyncio.gather(*(asyncio.to_thread(worker.quit) for worker in workers))
+
+    async def get(
+        self, url: str, /, *, selector: Optional[str] = None, timeout: float = BROWSER_READY_TIMEOUT
+    ) -> str:
+        """Renders `url`, returning its HTML as soon as `selector` matches (or once the network is idle)"""
+        # identical concurrent page loads share one render
+        return await self.inflight.do(("get", url, selector, timeout), lambda: self._get(url, selector, timeout))
+
+    async def _get(self, url: str, selector: Optional[str], timeout: float) -> str:
+        async with self.checkout() as worker:
+            await asyncio.to_thread(worker.render, url, selector, timeout)
+            return await asyncio.to_thread(
+                worker.driver.execute_script, "return document.documentElement.outerHTML"
+            )
+
+    async def screenshot(
+        self,
+        url: str,
+        /,
+        *,
+        selector: Optional[str] = None,
+        timeout: float = BROWSER_READY_TIMEOUT,
+        viewport: tuple[int, int] = SCREENSHOT_VIEWPORT,
+        get_cache: bool = True,
+    ) -> io.BytesIO:
+        key = self.screenshots.key(url, viewport)
+        b = await self.screenshots.get(key) if get_cache else None
+        if b is None:
+            # keyed on the normalized URL, so equivalent URLs share a render as well as a cache entry. the
+            # timeout is part of the key, so a short wait's partial render isn't handed to callers who asked for more
+            b = await self.inflight.do(
+                ("screenshot", key, selector, timeout),
+                lambda: self._screenshot(key, url, selector, timeout, viewport),
+            )
+        buf = io.BytesIO(b)  # each caller gets its own buffer over the shared bytes
         buf.seek(0)
         return buf
 
+    async def _screenshot(
+        self, key: str, url: str, selector: Optional[str], timeout: float, viewport: tuple[int, int]
+    ) -> bytes:
+        async with self.checkout() as worker:
+            await asyncio.to_thread(worker.resize, viewport)
+            ready = await asyncio.to_thread(worker.render, url, selector, timeout)
+            png: bytes = await asyncio.to_thread(worker.driver.get_screenshot_as_png)
+        if ready:  # only finished renders are cached, since the key doesn't say how long was waited
+            await self.screenshots.set(key, png)
+        return png
+
 
 SENTINEL_MESSAGE_CACHE_KEY = tuple[int, int]
 SENTINEL_MESSAGE_CACHE_VALUE = tuple[int, int, str, frozenset[str], int]
-SENTINEL_MESSAGE_CACHE = dict[SENTINEL_MESSAGE_CACHE_KEY, set[SENTINEL_MESSAGE_CACHE_VALUE]]
+# rough per message overhead of the tuple, its ints and its frozenset, on top of the content and URL lengths
+SENTINEL_MESSAGE_CACHE_VALUE_OVERHEAD = 400
 
 
-class SentinelMessageCache(SENTINEL_MESSAGE_CACHE):
-    def __init__(self, data: SENTINEL_MESSAGE_CACHE = None, *, limit: int = 100):
-        data = data or {}
-        self.limit = limit
-        super().__init__(data)
+class SentinelMessageCache:
+    """
+    Recently deleted and edited messages per (guild_id, channel_id). Each channel is a ring buffer of the
+    last `limit` messages in insertion order, and whole channels are evicted least recently used first
+    once the estimated size of everything goes over `max_bytes`. Reading a channel never allocates.
+    """
 
-    def __iter__(self) -> Iterator[SENTINEL_MESSAGE_CACHE_KEY]:
-        return super().__iter__()
+    EMPTY: tuple[SENTINEL_MESSAGE_CACHE_VALUE, ...] = ()
 
-    def add(self, __key: SENTINEL_MESSAGE_CACHE_KEY, __value: SENTINEL_MESSAGE_CACHE_VALUE) -> None:
-        if len(self[__key]) >= self.limit:
-            self[__key].remove(self._get_min(self[__key]))
-        self[__key].add(__value)
+    def __init__(self, *, limit: int = 100, max_bytes: int = SNIPE_CACHE_BYTES):
+        self.limit = limit
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._channels: OrderedDict[SENTINEL_MESSAGE_CACHE_KEY, deque[SENTINEL_MESSAGE_CACHE_VALUE]] = OrderedDict()
+        self._sizes: dict[SENTINEL_MESSAGE_CACHE_KEY, int] = {}
 
-    def __getitem__(self, __key: Union[SENTINEL_MESSAGE_CACHE_KEY, "SentinelMessageCacheKey"]) -> set[
-        SENTINEL_MESSAGE_CACHE_VALUE]:
+    def add(self, __key: SENTINEL_MESSAGE_CACHE_KEY, __value: SENTINEL_MESSAGE_CACHE_VALUE) -> None:
+        messages = self._channels.get(__key)
+        if messages is None:
+            messages = self._channels[__key] = deque(maxlen=self.limit)
+            self._sizes[__key] = 0
+        else:
+            self._channels.move_to_end(__key)
+
+        if len(messages) == self.limit:
+            self._resize(__key, -self._estimate(messages[0]))  # about to fall off the front
+        messages.append(__value)
+        self._resize(__key, self._estimate(__value))
+
+        while self.size > self.max_bytes and len(self._channels) > 1:
+            oldest = next(iter(self._channels))
+            del self._channels[oldest]
+            self.size -= self._sizes.pop(oldest)
+
+    def __getitem__(
+        self, __key: Union[SENTINEL_MESSAGE_CACHE_KEY, "SentinelMessageCacheKey"]
+    ) -> Sequence[SENTINEL_MESSAGE_CACHE_VALUE]:
+        """The channel's messages, oldest first. This is the live buffer, so copy it before awaiting anything"""
         if isinstance(__key, SentinelMessageCacheKey):
             __key = __key.dismantle()
-        try:
-            return super().__getitem__(__key)
-        except KeyError:
-            default = set()
-            self[__key] = default
-            return default
+        messages = self._channels.get(__key)
+        if messages is None:
+            return self.EMPTY
+        self._channels.move_to_end(__key)
+        return messages
+
+    def __contains__(self, __key: object) -> bool:
+        return __key in self._channels
+
+    def __iter__(self) -> Iterator[SENTINEL_MESSAGE_CACHE_KEY]:
+        return iter(self._channels)
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+    def _resize(self, __key: SENTINEL_MESSAGE_CACHE_KEY, __delta: int) -> None:
+        self._sizes[__key] += __delta
+        self.size += __delta
+
+    @staticmethod
+    def _estimate(__value: SENTINEL_MESSAGE_CACHE_VALUE) -> int:
+        return SENTINEL_MESSAGE_CACHE_VALUE_OVERHEAD + len(__value[2]) + sum(map(len, __value[3]))
 
-    def _dismantle_set(self, __value: set["SentinelMessageCacheValue"]) -> set[SENTINEL_MESSAGE_CACHE_VALUE]:
-        return set(map(lambda x: x.dismantle(), __value))
 
-    def _get_min(self, __value: set[SENTINEL_MESSAGE_CACHE_VALUE]) -> SENTINEL_MESSAGE_CACHE_VALUE:
-        return min(__value, key=lambda x: x[4])
+class SnipeStore:
+    """
+    Deleted and edited messages in a Redis stream per channel, so snipes are shared between processes and
+    survive restarts. Writes are buffered and sent in batches by `flush`. Streams are capped at `maxlen`
+    entries, and entries older than `retention` are trimmed (and idle streams expire) after that long.
+    """
+
+    def __init__(
+        self,
+        redis: aioredis.Redis,
+        *,
+        maxlen: int = SNIPE_STORE_MAXLEN,
+        retention: float = SNIPE_STORE_RETENTION,
+        batch_size: int = SNIPE_STORE_BATCH_SIZE,
+    ):
+        self.redis = redis
+        self.maxlen = maxlen
+        self.retention = retention
+        self.batch_size = batch_size
+        self.pending: list[tuple[SENTINEL_MESSAGE_CACHE_KEY, SENTINEL_MESSAGE_CACHE_VALUE]] = []
+        self.flushing: set[asyncio.Future[None]] = set()
+
+    @staticmethod
+    def stream_key(__key: SENTINEL_MESSAGE_CACHE_KEY) -> str:
+        return f"snipes:{__key[0]}:{__key[1]}"
+
+    def min_id(self) -> str:
+        """The oldest stream ID still within the retention window"""
+        return f"{int((time.time() - self.retention) * 1000)}-0"
+
+    def add(self, __key: SENTINEL_MESSAGE_CACHE_KEY, __value: SENTINEL_MESSAGE_CACHE_VALUE) -> None:
+        self.pending.append((__key, __value))
+        if len(self.pending) >= self.batch_size:
+            flushing = asyncio.ensure_future(self.flush())
+            self.flushing.add(flushing)  # keeps a reference until it's done
+            flushing.add_done_callback(self.flushing.discard)
+
+    async def flush(self) -> None:
+        pending, self.pending = self.pending, []
+        if not pending:
+            return
+        min_id = self.min_id()
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key, value in pending:
+                    pipe.xadd(self.stream_key(key), self._dump(value), maxlen=self.maxlen, approximate=True)
+                for stream in {self.stream_key(key) for key, _ in pending}:
+                    pipe.xtrim(stream, minid=min_id, approximate=True)
+                    pipe.expire(stream, int(math.ceil(self.retention)))
+                await pipe.execute()
+        except RedisError as e:
+            # snipes are best effort, so a failed batch is dropped rather than retried forever
+            logging.warning(f"Failed to store {len(pending)} snipes: {e}")
+
+    async def count(self, __key: SENTINEL_MESSAGE_CACHE_KEY) -> int:
+        stream = self.stream_key(__key)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.xtrim(stream, minid=self.min_id(), approximate=False)  # exact, so the count doesn't include expired snipes
+            pipe.xlen(stream)
+            _, length = await pipe.execute()
+        return length
+
+    async def page(
+        self,
+        __key: SENTINEL_MESSAGE_CACHE_KEY,
+        count: int,
+        *,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+        oldest: bool = False,
+    ) -> list[tuple[str, SENTINEL_MESSAGE_CACHE_VALUE]]:
+        """
+        Up to `count` snipes as (stream ID, value), newest first: the newest ones, the ones right `before`
+        (older than) or `after` (newer than) a stream ID, or the `oldest` ones.
+        """
+        stream = self.stream_key(__key)
+        if after is not None or oldest:
+            entries = await self.redis.xrange(
+                stream, min=f"({after}" if after is not None else self.min_id(), max="+", count=count
+            )
+            entries.reverse()
+        else:
+            entries = await self.redis.xrevrange(
+                stream, max=f"({before}" if before is not None else "+", min=self.min_id(), count=count
+            )
+        return [(entry_id.decode(), self._load(fields)) for entry_id, fields in entries]
+
+    @staticmethod
+    def _dump(__value: SENTINEL_MESSAGE_CACHE_VALUE) -> dict[str, str | int]:
+        message_id, author_id, content, attachment_urls, timestamp = __value
+        return {
+            "message_id": message_id,
+            "author_id": author_id,
+            "content": content,
+            "attachment_urls": json.dumps(sorted(attachment_urls)),
+            "timestamp": timestamp,
+        }
+
+    @staticmethod
+    def _load(fields: dict[bytes, bytes]) -> SENTINEL_MESSAGE_CACHE_VALUE:
+        return (
+            int(fields[b"message_id"]),
+            int(fields[b"author_id"]),
+            fields[b"content"].decode(),
+            frozenset(json.loads(fields[b"attachment_urls"])),
+            int(fields[b"timestamp"]),
+        )
 
 
 @dataclass
@@ -477,9 +1184,8 @@ class SentinelMessageCacheValue:
 
 async def _get_prefix(bot: Sentinel, message: discord.Message) -> str:
     if message.guild is None:
-        return ">>"
-    await bot.gdm.ensure_guild(message.guild.id)
-    return await bot.gdm.get_prefix(message.guild.id)
+        return DEFAULT_PREFIX
+    return await bot.gcm.resolve_prefix(message.guild.id)
 
 
 SentinelCogT = TypeVar("SentinelCogT", bound=SentinelCog, covariant=True)
@@ -0,0 +1,149 @@
+import asyncio
+from dataclasses import dataclass
+import heapq
+import logging
+import re
+import time
+from typing import Iterable
+import zlib
+
+import aiohttp
+
+from config import RTFM_INDEX_CACHE_SIZE, RTFM_INDEX_REFRESH_INTERVAL, RTFM_NEGATIVE_TTL
+from .caches import LRUCache, SingleFlight
+from .sentinel import CachePolicy, SentinelAIOSession
+
+# name, domain:role, priority, uri, display name. names (std:label) may contain spaces, so the first group is lazy
+INVENTORY_LINE = re.compile(r"(?x)(.+?)\s+(\S+)\s+(-?\d+)\s+?(\S*)\s+(.*)")
+
+
+class InventoryError(ValueError):
+    """Raised when an objects.inv isn't a version 2, zlib compressed Sphinx inventory"""
+
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class InventoryEntry:
+    name: str
+    role: str
+    uri: str
+    display_name: str
+
+
+def parse_inventory(data: bytes) -> list[InventoryEntry]:
+    """Decompresses and parses a Sphinx objects.inv"""
+    lines = data.split(b"\n", 4)
+    if len(lines) < 5 or lines[0].rstrip() != b"# Sphinx inventory version 2":
+        raise InventoryError("Not a version 2 Sphinx inventory")
+    if b"zlib" not in lines[3]:
+        raise InventoryError("Inventory is not zlib compressed")
+    try:
+        body = zlib.decompress(lines[4]).decode()
+    except zlib.error as e:
+        raise InventoryError(f"Could not decompress inventory: {e}")
+
+    entries: list[InventoryEntry] = []
+    for line in body.splitlines():
+        match = INVENTORY_LINE.match(line.rstrip())
+        if match is None:
+            continue
+        name, role, priority, uri, display_name = match.groups()
+        if priority == "-1":
+            continue  # explicitly hidden from search
+        if uri.endswith("$"):
+            uri = uri[:-1] + name
+        entries.append(InventoryEntry(name, role, uri, name if display_name == "-" else display_name))
+    return entries
+
+
+class SymbolIndex:
+    """The symbols of one documentation project, searchable by ranked fuzzy matching"""
+
+    def __init__(self, entries: Iterable[InventoryEntry]):
+        self.entries = list(entries)
+        self._names = [entry.name.lower() for entry in self.entries]
+        self._tails = [name.rpartition(".")[2] for name in self._names]
+        self.built_at = time.monotonic()
+        self.used = False
+
+    def search(self, query: str, limit: int) -> list[InventoryEntry]:
+        """
+        Ranks exact names first, then names whose last component starts with the query, then names
+        containing it, and then names containing its characters in order. Ties go to tighter, shorter matches.
+        """
+        self.used = True
+        query = query.strip().lower()
+        if not query:
+            return []
+        pattern = re.compile(".*?".join(map(re.escape, query)))
+
+        ranked: list[tuple[int, int, int, int]] = []
+        for i, (name, tail) in enumerate(zip(self._names, self._tails)):
+            match = pattern.search(name)
+            if match is None:
+                continue
+            if name == query or tail == query:
+                tier = 0
+            elif tail.startswith(query):
+                tier = 1
+            elif query in name:
+                tier = 2
+            else:
+                tier = 3
+            ranked.append((tier, match.end() - match.start(), len(name), i))
+        return [self.entries[rank[3]] for rank in heapq.nsmallest(limit, ranked)]
+
+
+class SphinxIndexes:
+    """
+    Symbol indexes per (project, version, lang), built from each project's objects.inv and evicted least
+    recently used first. The raw inventories are persisted through the session's Redis backed cache,
+    so a restart rebuilds indexes without downloading them again.
+    """
+
+    def __init__(
+        self,
+        session: SentinelAIOSession,
+        *,
+        maxsize: int = RTFM_INDEX_CACHE_SIZE,
+        refresh_after: float = RTFM_INDEX_REFRESH_INTERVAL,
+    ):
+        self.session = session
+        self.refresh_after = refresh_after
+        self.indexes: LRUCache[tuple[str, str, str], SymbolIndex] = LRUCache(maxsize)
+        self.inflight: SingleFlight[tuple[str, str, str], SymbolIndex] = SingleFlight()
+
+    @staticmethod
+    def base_url(project: str, version: str, lang: str) -> str:
+        return f"https://{project}.readthedocs.io/{lang}/{version}"
+
+    async def get(self, project: str, version: str, lang: str) -> SymbolIndex:
+        key = (project, version, lang)
+        index = self.indexes.get(key)
+        if index is None:
+            index = await self.inflight.do(key, lambda: self._build(key))
+        return index
+
+    async def _build(self, key: tuple[str, str, str], *, get_cache: bool = True) -> SymbolIndex:
+        data = await self.session.getbytes(
+            self.base_url(*key) + "/objects.inv",
+            policy=CachePolicy(ttl=self.refresh_after, negative_ttl=RTFM_NEGATIVE_TTL),
+            get_cache=get_cache,
+        )
+        # large inventories take long enough to decompress and parse to stall the event loop
+        index = SymbolIndex(await asyncio.to_thread(parse_inventory, data))
+        self.indexes[key] = index
+        return index
+
+    async def refresh(self) -> None:
+        """Rebuilds every index which is older than `refresh_after` and has been searched since it was built"""
+        now = time.monotonic()
+        for key in self.indexes:
+            index = self.indexes.peek(key)
+            if index is None or not index.used or now - index.built_at < self.refresh_after:
+                continue
+            try:
+                await self.inflight.do(key, lambda: self._build(key, get_cache=False))
+            except (aiohttp.ClientError, asyncio.TimeoutError, InventoryError) as e:
+                logging.warning(f"Could not refresh the {'/'.join(key)} docs index: {e}")